@@ -0,0 +1,201 @@
+"""
+Load generator and latency benchmark for the phone directory service
+- starts a server in a separate process (or uses a running server, see --external)
+- drives it with concurrent clients (threads spread over client processes)
+- requests follow a configurable mix of GET (existing names), MISS (unknown names) and GETALL
+- connections are reused for a configurable number of requests
+- reports throughput and latency percentiles, optionally as JSON file
+- usage: benchmark.py [-h] (see options)
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import random
+import socket
+import threading
+import time
+
+import clientserver
+import const_cs
+from context import lab_stats
+
+logging.getLogger("vs2lab").setLevel(logging.WARNING)  # clients and server log every request
+
+OPERATIONS = ("get", "miss", "getall")
+
+
+def run_server(store_path, ready, stop):
+    """ Serve until stop is set """
+    server = clientserver.Server(store_path)
+
+    def shutdown():
+        stop.wait()
+        server._serving = False  # pylint: disable=protected-access
+
+    threading.Thread(target=shutdown, daemon=True).start()
+    ready.set()
+    server.serve()
+
+
+def connect():
+    """ Connect a client, retrying while the server is busy accepting """
+    for _ in range(50):
+        try:
+            return clientserver.Client()
+        except ConnectionRefusedError:
+            time.sleep(0.1)
+    return clientserver.Client()
+
+
+def run_client(args, names, deadline, results):
+    """ Send requests until the deadline, collect (operation, latency) samples """
+    rnd = random.Random()
+    weights = [args.mix[operation] for operation in OPERATIONS]
+    samples = {operation: [] for operation in OPERATIONS}
+    errors = 0
+    client = None
+    sent = 0
+    while time.time() < deadline:
+        operation = rnd.choices(OPERATIONS, weights)[0]
+        if operation == "get":
+            request = "GET " + rnd.choice(names)
+        elif operation == "miss":
+            request = f"GET unknown{rnd.randrange(1 << 30)}"
+        else:
+            request = "GETALL"
+        started = time.perf_counter()
+        try:
+            if client is None:
+                client = connect()  # connection setup counts to the latency of the first request
+            client.call(request)
+        except OSError:
+            errors += 1
+            if client is not None:
+                client.close()
+                client = None
+            continue
+        samples[operation].append(time.perf_counter() - started)
+        sent += 1
+        if args.reuse and sent % args.reuse == 0:
+            client.close()
+            client = None
+    if client is not None:
+        client.close()
+    results.append((samples, errors))
+
+
+def run_clients(args, names, deadline, n_threads, queue):
+    """ Client process running n_threads clients """
+    results = []
+    threads = [threading.Thread(target=run_client, args=(args, names, deadline, results)) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    queue.put(results)
+
+
+def summary(latencies, duration):
+    """ Throughput and latency percentiles (milliseconds) of a list of latencies """
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / duration,
+        "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else None,
+        "p50_ms": 1000 * lab_stats.percentile(latencies, 50) if latencies else None,
+        "p99_ms": 1000 * lab_stats.percentile(latencies, 99) if latencies else None,
+        "p999_ms": 1000 * lab_stats.percentile(latencies, 99.9) if latencies else None,
+        "max_ms": 1000 * latencies[-1] if latencies else None,
+    }
+
+
+def parse_mix(text):
+    """ Parse a request mix like 'get=90,miss=9,getall=1' """
+    mix = dict.fromkeys(OPERATIONS, 0)
+    for part in text.split(","):
+        operation, weight = part.split("=")
+        if operation not in mix:
+            raise argparse.ArgumentTypeError(f"unknown operation {operation}")
+        mix[operation] = float(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("empty mix")
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Phone directory load generator")
+    parser.add_argument("--clients", type=int, default=16, help="number of concurrent clients")
+    parser.add_argument("--processes", type=int, default=min(4, mp.cpu_count()), help="client processes")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to send requests")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("get=90,miss=9,getall=1"),
+                        help="request mix as weights, e.g. get=90,miss=9,getall=1")
+    parser.add_argument("--reuse", type=int, default=0,
+                        help="requests per connection (0: keep one connection per client)")
+    parser.add_argument("--store", help="serve from a store file (see telefonbuch_store)")
+    parser.add_argument("--external", action="store_true", help="benchmark a running server")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    stop = mp.Event()
+    server = None
+    if not args.external:
+        ready = mp.Event()
+        server = mp.Process(target=run_server, args=(args.store, ready, stop))
+        server.start()
+        ready.wait()
+
+    try:
+        client = connect()
+        names = [line.split(":")[0] for line in client.call("GETALL").split("\n") if line]
+        client.close()
+
+        queue = mp.Queue()
+        n_processes = max(1, min(args.processes, args.clients))
+        started = time.time()
+        deadline = started + args.duration
+        processes = [mp.Process(target=run_clients,
+                                args=(args, names, deadline, args.clients // n_processes
+                                      + (1 if i < args.clients % n_processes else 0), queue))
+                     for i in range(n_processes)]
+        for process in processes:
+            process.start()
+        results = [result for _ in processes for result in queue.get()]
+        for process in processes:
+            process.join()
+        duration = time.time() - started
+    finally:
+        stop.set()
+        if server is not None:
+            server.join(5)  # the server checks for shutdown every 3 seconds
+            if server.is_alive():
+                server.terminate()
+
+    per_operation = {operation: [] for operation in OPERATIONS}
+    for samples, _ in results:
+        for operation in OPERATIONS:
+            per_operation[operation] += samples[operation]
+    report = {
+        "config": {"clients": args.clients, "processes": n_processes, "duration": args.duration,
+                   "mix": args.mix, "reuse": args.reuse, "store": args.store, "external": args.external,
+                   "host": const_cs.HOST, "port": const_cs.PORT, "hostname": socket.gethostname()},
+        "errors": sum(errors for _, errors in results),
+        "total": summary([latency for samples in per_operation.values() for latency in samples], duration),
+        "operations": {operation: summary(samples, duration) for operation, samples in per_operation.items()
+                       if samples},
+    }
+
+    for name, stats in [("total", report["total"])] + list(report["operations"].items()):
+        if not stats["requests"]:
+            continue
+        print(f"{name:7} {stats['requests']:8d} requests {stats['throughput']:10.1f}/s   "
+              f"p50 {stats['p50_ms']:8.3f} ms   p99 {stats['p99_ms']:8.3f} ms   p999 {stats['p999_ms']:8.3f} ms")
+    print(f"errors  {report['errors']}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
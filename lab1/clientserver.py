@@ -1,23 +1,119 @@
 """
 Client and server using classes
+
+Requests:
+- GET <name>: number of a name
+- GETALL: all entries
+- SEARCH <prefix> [<offset> [<limit>]]: number of names starting with prefix, followed by a page of these entries
+- PUT <name> <number>: add or update an entry
+- DELETE <name>: remove an entry
+
+Requests and responses are UTF-8 strings sent as frames: a 4 byte length (big endian) followed by the payload.
+A connection carries any number of requests, responses are returned in request order (requests may be pipelined).
 """
 
+import bisect
 import logging
+import selectors
 import socket
+import struct
+from collections import UserDict, deque
 
 import const_cs
 from context import lab_logging
+from telefonbuch_store import MappedStore
 
 lab_logging.setup(stream_level=logging.INFO)  # init loging channels for the lab
 
 # pylint: disable=logging-not-lazy, line-too-long
 
+HEADER = struct.Struct(">I")  # frame header: payload length
+MAX_REQUEST = 65536  # maximum request payload length in bytes
+CHUNK = 65536  # maximum number of bytes per send, larger responses are streamed in chunks
+PAGE_SIZE = 20  # default number of SEARCH results per response
+MAX_PAGE_SIZE = 1000  # maximum number of SEARCH results per response
+
+
+def frame(text):
+    """ Encode a string (or encoded bytes) as frame """
+    payload = text if isinstance(text, bytes) else text.encode('utf-8')
+    return HEADER.pack(len(payload)) + payload
+
+
+def unframe(buffer):
+    """
+    Take the next complete frame off a buffer, returns its string or None if incomplete.
+    A frame that is not valid UTF-8 is taken off the buffer as well before UnicodeDecodeError is raised.
+    """
+    if len(buffer) < HEADER.size:
+        return None
+    (length,) = HEADER.unpack_from(buffer)
+    end = HEADER.size + length
+    if len(buffer) < end:
+        return None
+    payload = bytes(buffer[HEADER.size:end])
+    del buffer[:end]
+    return payload.decode('utf-8')
+
+
+class Telefonbuch(UserDict):
+    """
+    Phone directory that keeps its GETALL listing encoded and ready to send.
+    Entries are kept in a dict or in a given store (e.g. a MappedStore), listing and search index
+    are only built when needed.
+    """
+
+    def __init__(self, entries=None, store=None):
+        self._lines = None  # encoded listing line per name (in directory order), None if not built
+        self._listing = None  # cached listing, None if outdated
+        self._index = None  # sorted names (built with the first search), None if not built
+        super().__init__()
+        if store is not None:
+            self.data = store
+        if entries is not None:
+            self.update(entries)
+
+    def __setitem__(self, name, number):
+        if self._index is not None and name not in self.data:
+            bisect.insort(self._index, name)
+        super().__setitem__(name, number)
+        if self._lines is not None:
+            self._lines[name] = f"{name}:{number}".encode('utf-8')  # only re-encode the changed entry
+        self._listing = None
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        if self._lines is not None:
+            del self._lines[name]
+        self._listing = None
+        if self._index is not None:
+            del self._index[bisect.bisect_left(self._index, name)]
+
+    def search(self, prefix, offset=0, limit=PAGE_SIZE):
+        """ Number of names starting with prefix and a page of these names (in sorted order) """
+        if self._index is None:
+            self._index = sorted(self.data)
+        start = bisect.bisect_left(self._index, prefix)
+        end = bisect.bisect_left(self._index, prefix + "\U0010ffff")  # after all names with that prefix
+        first = min(start + offset, end)
+        return end - start, self._index[first:min(first + limit, end)]
+
+    def listing(self):
+        """ All entries as encoded lines """
+        if self._lines is None:
+            self._lines = {name: f"{name}:{number}".encode('utf-8') for name, number in self.data.items()}
+        if self._listing is None:
+            self._listing = b"\n".join(self._lines.values())
+        return self._listing
+
+
 class Server:
-    """ The server """
+    """ The server, serving many concurrent clients in a single thread (selectors based event loop) """
     _logger = logging.getLogger("vs2lab.lab1.clientserver.Server")
     _serving = True
+    _timeout = 3  # seconds between checks of _serving while idle
 
-    def __init__(self):
+    def __init__(self, store_path=None):
         self._logger.info("Creating server socket")
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # prevents errors due to "addresses in use"
@@ -25,8 +121,8 @@ class Server:
         self.sock.settimeout(3)  # time out in order not to block forever
         self._logger.info("Server bound to socket " + str(self.sock))
 
-        # Telefonbuch
-        self.telefonbuch = {
+        # Telefonbuch (kept in memory or in a store file, new store files start with these entries)
+        entries = {
             "Alpha": "0176-12345678",
             "Beta": "0176-23456789", 
             "Gamma": "0176-123123123",
@@ -84,46 +180,158 @@ class Server:
             "Kaiser": 50418,
             "Björn": 645646 
         }
+        self.store = MappedStore(store_path) if store_path else None
+        if self.store is None:
+            self.telefonbuch = Telefonbuch(entries)
+        else:
+            self.telefonbuch = Telefonbuch(None if len(self.store) else entries, store=self.store)
+            self._logger.info(f"Opened store {store_path} with {len(self.store)} entries")
 
     def handle_request(self, request):
         if request.startswith("GETALL"):
-            entries = []
-            for name, number in self.telefonbuch.items():
-                entry = name + ":" + str(number)
-                entries.append(entry)
-            return "\n".join(entries)
+            return self.telefonbuch.listing()  # encoded once, reused until an entry changes
         elif request.startswith("GET"):
             name_list = request.split(" ")
+            if len(name_list) < 2 or not name_list[1]:
+                return f"invalid request {request}\n"
             name = name_list[1]
             number = self.telefonbuch.get(name)
             if number:
                 return f"{name}: {number}\n"
             else:
                 return f"{name} not found\n"
+        elif request.startswith("SEARCH"):
+            args = request.split(" ")
+            prefix = args[1] if len(args) > 1 else ""
+            try:
+                offset = max(int(args[2]), 0) if len(args) > 2 else 0
+                limit = min(max(int(args[3]), 0), MAX_PAGE_SIZE) if len(args) > 3 else PAGE_SIZE
+            except ValueError:
+                return f"invalid request {request}\n"
+            total, names = self.telefonbuch.search(prefix, offset, limit)
+            return f"{total} matches\n" + "".join(f"{name}: {self.telefonbuch[name]}\n" for name in names)
+        elif request.startswith("PUT"):
+            args = request.split(" ", 2)
+            if len(args) < 3 or not args[1]:
+                return f"invalid request {request}\n"
+            self.telefonbuch[args[1]] = args[2]
+            return f"{args[1]} stored\n"
+        elif request.startswith("DELETE"):
+            name = request[len("DELETE "):]
+            if name not in self.telefonbuch:
+                return f"{name} not found\n"
+            del self.telefonbuch[name]
+            return f"{name} deleted\n"
+        return f"unknown request {request}\n"
 
     def serve(self):
-        """ Serve echo """
-        self.sock.listen(1)
+        """ Serve phone directory requests """
+        self.sock.listen(socket.SOMAXCONN)  # queue many pending connections
+        self.sock.setblocking(False)  # never block the event loop
+        selector = selectors.DefaultSelector()
+        selector.register(self.sock, selectors.EVENT_READ)
         self._logger.info("Server is now listening")
-        while self._serving:  # as long as _serving (checked after connections or socket timeouts)
-            try:
-                # pylint: disable=unused-variable
-                (connection, address) = self.sock.accept()  # returns new socket and address of client
-                self._logger.info(f"Accepted connection from {address}")
-                while True:  # forever
-                    data = connection.recv(1024)  # receive data from client
-                    if not data:
-                        break  # stop if client stopped
-                    response = self.handle_request(data.decode('utf-8'))
-                    connection.send(response.encode('utf-8'))  # return sent data plus an "*"
-                    self._logger.info("Sending response")
-                connection.close()  # close the connection
-                self._logger.info("Closing connection")
-            except socket.timeout:
-                pass  # ignore timeouts
+        while self._serving:  # as long as _serving (checked after events or timeouts)
+            for key, events in selector.select(timeout=self._timeout):
+                if key.fileobj is self.sock:
+                    self._accept(selector)
+                else:
+                    self._service(selector, key, events)
+        for key in list(selector.get_map().values()):  # close remaining client connections
+            if key.fileobj is not self.sock:
+                self._close(selector, key.fileobj)
+        selector.close()
         self.sock.close()
+        if self.store is not None:
+            self.store.close()  # write all changes to the store file
         self._logger.info("Server down.")
 
+    def _accept(self, selector):
+        """ Accept a new connection and watch it for requests """
+        try:
+            (connection, address) = self.sock.accept()  # returns new socket and address of client
+        except BlockingIOError:
+            return  # connection attempt was withdrawn
+        self._logger.info(f"Accepted connection from {address}")
+        connection.setblocking(False)
+        selector.register(connection, selectors.EVENT_READ, data=(bytearray(), deque()))  # data: input, output buffers
+
+    def _service(self, selector, key, events):
+        """ Handle a request or send pending output of a connection """
+        connection, (received, output) = key.fileobj, key.data
+        if events & selectors.EVENT_READ:
+            try:
+                data = connection.recv(65536)  # receive data from client
+            except ConnectionError:
+                data = b''
+            if not data:
+                self._close(selector, connection)  # stop if client stopped
+                return
+            received += data
+            while True:  # answer all complete requests in order
+                try:
+                    request = unframe(received)
+                except UnicodeDecodeError:
+                    self._logger.warning("Request is not valid UTF-8")
+                    self._respond(output, "invalid request\n")
+                    continue
+                if request is None:
+                    break
+                self._respond(output, self._handle(request))
+                self._logger.info("Sending response")
+            if len(received) > HEADER.size + MAX_REQUEST:
+                self._logger.warning("Request too long")
+                self._close(selector, connection)
+                return
+        while output:  # send as much as the socket takes
+            buffer = output[0]
+            try:
+                sent = connection.send(buffer[:CHUNK])
+            except BlockingIOError:
+                break
+            except ConnectionError:
+                self._close(selector, connection)
+                return
+            if sent == len(buffer):
+                output.popleft()
+            elif isinstance(buffer, bytearray):
+                del buffer[:sent]
+            else:
+                output[0] = buffer[sent:]
+            if sent < CHUNK and output:
+                break  # socket buffer is full
+        # watch for writability only while output is pending
+        wanted = selectors.EVENT_READ | selectors.EVENT_WRITE if output else selectors.EVENT_READ
+        if key.events != wanted:
+            selector.modify(connection, wanted, data=key.data)
+
+    def _handle(self, request):
+        """ Answer a request, a failing request is answered with an error instead of stopping the server """
+        try:
+            return self.handle_request(request)
+        except Exception:  # pylint: disable=broad-except
+            self._logger.exception(f"Request {request!r} failed")
+            return f"error handling request {request}\n"
+
+    @staticmethod
+    def _respond(output, response):
+        """ Queue a framed response, small responses are coalesced, large ones are sent from the original bytes """
+        payload = response if isinstance(response, bytes) else response.encode('utf-8')
+        header = HEADER.pack(len(payload))
+        if len(payload) >= CHUNK:
+            output.append(bytearray(header))
+            output.append(memoryview(payload))  # no copy, sent in chunks
+        elif output and isinstance(output[-1], bytearray):
+            output[-1] += header + payload
+        else:
+            output.append(bytearray(header + payload))
+
+    def _close(self, selector, connection):
+        """ Stop watching a connection and close it """
+        selector.unregister(connection)
+        connection.close()  # close the connection
+        self._logger.info("Closing connection")
+
 
 class Client:
     """ The client """
@@ -133,33 +341,77 @@ class Client:
         self.logger.info("Creating client socket")
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.connect((const_cs.HOST, const_cs.PORT))
+        self._buffer = bytearray()  # received data not yet consumed
         self.logger.info("Client connected to socket " + str(self.sock))
 
+    def call(self, request):
+        """ Call server (reusing the connection) """
+        self.logger.info("Sending request")
+        self.sock.sendall(frame(request))  # send request as frame
+        response = self._receive()
+        self.logger.info("Response received")
+        return response
+
     def send_request(self, request):
         """ Call server """
-        self.logger.info("Sending request")
-        self.sock.send(request.encode('utf-8'))  # send encoded string as data
+        return self.call(request)
 
-        data = self.sock.recv(1024)  # receive the response
-        response = data.decode('utf-8')
-        self.logger.info("Response received")
+    def pipeline(self, requests):
+        """ Send several requests at once and collect their responses (in request order) """
+        self.logger.info(f"Sending {len(requests)} requests")
+        self.sock.sendall(b"".join(frame(request) for request in requests))
+        responses = [self._receive() for _ in requests]
+        self.logger.info("Responses received")
+        return responses
 
-        self.sock.close()  # close the connection
-        self.logger.info("Client down.")
+    def _receive(self):
+        """ Receive the next response frame """
+        response = unframe(self._buffer)
+        while response is None:
+            data = self.sock.recv(65536)  # receive (part of) the response
+            if not data:
+                raise ConnectionError("connection closed by server")
+            self._buffer += data
+            response = unframe(self._buffer)
         return response
 
     def GET(self, name):
         self.logger.info("Sending GET request")
-        response = self.send_request(f"GET {name}")
+        response = self.call(f"GET {name}")
         print(response)
         return response
+
+    def GETMANY(self, names):
+        self.logger.info("Sending pipelined GET requests")
+        responses = self.pipeline([f"GET {name}" for name in names])
+        print("".join(responses))
+        return responses
     
+    def SEARCH(self, prefix, offset=0, limit=PAGE_SIZE):
+        self.logger.info("Sending SEARCH request")
+        response = self.call(f"SEARCH {prefix} {offset} {limit}")
+        print(response)
+        return response
+
+    def PUT(self, name, number):
+        self.logger.info("Sending PUT request")
+        response = self.call(f"PUT {name} {number}")
+        print(response)
+        return response
+
+    def DELETE(self, name):
+        self.logger.info("Sending DELETE request")
+        response = self.call(f"DELETE {name}")
+        print(response)
+        return response
+
     def GETALL(self):
         self.logger.info("Sending GETALL request")
-        response = self.send_request("GETALL")
+        response = self.call("GETALL")
         print(response)
         return response
 
     def close(self):
         """ Close socket """
         self.sock.close()
+        self.logger.info("Client down.")
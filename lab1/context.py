@@ -21,4 +21,4 @@ def add_parent_path(steps_up=1):
 add_parent_path()
 
 # following imports are used by other modules to access shared packages
-from lib import lab_logging, lab_channel # pylint: disable=import-error, unused-import, wrong-import-position
+from lib import lab_logging, lab_channel, lab_stats # pylint: disable=import-error, unused-import, wrong-import-position
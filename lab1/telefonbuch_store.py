@@ -0,0 +1,211 @@
+"""
+File based phone directory store
+
+The store is a hash table in a memory mapped file. Lookups read single records from the mapping,
+so opening a store takes constant time and memory, independent of the number of entries.
+
+File layout:
+- header: magic, version, number of slots, number of entries, number of used slots, end of data, dead bytes
+- slot table: offset of the record per slot (0: empty, 1: deleted), open addressing with linear probing
+- data: records (live flag, name length, number length, name, number) in insertion order
+
+Deleted and replaced records stay in the data area until the table is rebuilt (when the load gets too high
+or when most of the data area is taken by dead records).
+Changes are written to the mapping and reach the file with flush (or close) at the latest.
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import MutableMapping
+
+HEADER = struct.Struct(">4sIQQQQQ")  # magic, version, slots, entries, used slots, end of data, dead bytes
+SLOT = struct.Struct(">Q")  # record offset
+RECORD = struct.Struct(">BHH")  # live flag, name length, number length
+MAX_LENGTH = 0xFFFF  # maximum length of encoded names and numbers
+MAGIC = b"VSTB"
+VERSION = 2
+EMPTY = 0  # slot never used
+DELETED = 1  # slot of a deleted entry (probing continues)
+MAX_LOAD = 0.7  # maximum share of used slots (entries and deleted)
+MAX_DEAD = 0.5  # maximum share of dead records in the data area
+MIN_COMPACT = 65536  # dead bytes below which the data area is not compacted
+
+
+class MappedStore(MutableMapping):
+    """ Mapping of names to numbers (strings) stored in a memory mapped file """
+
+    def __init__(self, path, slots=1024):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._create(path, slots)
+        self._file = open(path, "r+b")
+        self._open()
+
+    @staticmethod
+    def _create(path, slots):
+        """ Write an empty store with a power of two number of slots """
+        slots = 1 << max(slots - 1, 1).bit_length()
+        data = HEADER.size + slots * SLOT.size
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, slots, 0, 0, data, 0))
+            file.truncate(data + 65536)  # room for the first records
+
+    def _open(self):
+        """ Map the file and read its header """
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        magic, version, self._slots, self._count, self._used, self._end, self._dead = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a phone directory store")
+        self._mask = self._slots - 1
+        self._data = HEADER.size + self._slots * SLOT.size
+
+    def _write_header(self):
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, self._slots, self._count, self._used, self._end, self._dead)
+
+    def _slot(self, i):
+        return SLOT.unpack_from(self._mm, HEADER.size + i * SLOT.size)[0]
+
+    def _set_slot(self, i, offset):
+        SLOT.pack_into(self._mm, HEADER.size + i * SLOT.size, offset)
+
+    def _record(self, offset):
+        """ Live flag, name and number (encoded) of a record """
+        live, name_len, number_len = RECORD.unpack_from(self._mm, offset)
+        start = offset + RECORD.size
+        return live, self._mm[start:start + name_len], self._mm[start + name_len:start + name_len + number_len]
+
+    def _probe(self, key):
+        """ Slot and record offset of a name, or the slot to insert it and 0 if missing """
+        i = zlib.crc32(key) & self._mask
+        free = None
+        while True:
+            offset = self._slot(i)
+            if offset == EMPTY:
+                return (i if free is None else free), 0
+            if offset == DELETED:
+                if free is None:
+                    free = i
+            else:
+                _, name_len, _ = RECORD.unpack_from(self._mm, offset)
+                start = offset + RECORD.size
+                if self._mm[start:start + name_len] == key:
+                    return i, offset
+            i = (i + 1) & self._mask
+
+    def _append(self, key, value):
+        """ Append a live record to the data area, returns its offset """
+        size = RECORD.size + len(key) + len(value)
+        if self._end + size > len(self._mm):
+            self._write_header()  # remapping reads the header again
+            self._mm.close()
+            self._file.truncate(max(2 * (self._end + size), 65536))
+            self._open()
+        offset = self._end
+        RECORD.pack_into(self._mm, offset, 1, len(key), len(value))
+        self._mm[offset + RECORD.size:offset + size] = key + value
+        self._end += size
+        return offset
+
+    def _release(self, offset):
+        """ Mark a record as dead and count its bytes """
+        _, name_len, number_len = RECORD.unpack_from(self._mm, offset)
+        self._mm[offset] = 0
+        self._dead += RECORD.size + name_len + number_len
+
+    def _compact(self):
+        """ Rebuild the store when dead records take most of the data area """
+        if self._dead > MIN_COMPACT and self._dead > MAX_DEAD * (self._end - self._data):
+            self._rebuild(self._slots)
+
+    def _rebuild(self, slots):
+        """ Rewrite the store with a new slot table, dropping deleted records """
+        path = self.path + ".tmp"
+        if os.path.exists(path):
+            os.remove(path)
+        rebuilt = MappedStore(path, slots)
+        for name, number in self._entries():
+            rebuilt[name.decode("utf-8")] = number.decode("utf-8")
+        rebuilt.close()
+        self.close()
+        os.replace(path, self.path)
+        self._file = open(self.path, "r+b")
+        self._open()
+
+    def __getitem__(self, name):
+        _, offset = self._probe(name.encode("utf-8"))
+        if not offset:
+            raise KeyError(name)
+        live, _, number = self._record(offset)
+        if not live:
+            raise KeyError(name)
+        return number.decode("utf-8")
+
+    def __setitem__(self, name, number):
+        key, value = name.encode("utf-8"), str(number).encode("utf-8")
+        if len(key) > MAX_LENGTH or len(value) > MAX_LENGTH:
+            raise ValueError(f"name or number longer than {MAX_LENGTH} bytes")
+        i, offset = self._probe(key)
+        if offset:
+            _, _, old = self._record(offset)
+            if len(old) == len(value):  # same size: update in place
+                start = offset + RECORD.size + len(key)
+                self._mm[start:start + len(value)] = value
+                return
+            self._release(offset)  # replace record
+            self._set_slot(i, self._append(key, value))
+            self._write_header()
+            self._compact()
+            return
+        if self._used + 1 > MAX_LOAD * self._slots:
+            self._rebuild(self._slots * 2 if self._count + 1 > MAX_LOAD * self._slots / 2 else self._slots)
+            i, _ = self._probe(key)
+        empty = self._slot(i) == EMPTY
+        self._set_slot(i, self._append(key, value))
+        if empty:
+            self._used += 1
+        self._count += 1
+        self._write_header()
+
+    def __delitem__(self, name):
+        i, offset = self._probe(name.encode("utf-8"))
+        if not offset:
+            raise KeyError(name)
+        self._release(offset)
+        self._set_slot(i, DELETED)
+        self._count -= 1
+        self._write_header()
+        self._compact()
+
+    def _entries(self):
+        """ Names and numbers (encoded) of all live records in insertion order """
+        offset = self._data
+        while offset < self._end:
+            live, name_len, number_len = RECORD.unpack_from(self._mm, offset)
+            start = offset + RECORD.size
+            if live:
+                yield self._mm[start:start + name_len], self._mm[start + name_len:start + name_len + number_len]
+            offset = start + name_len + number_len
+
+    def __iter__(self):
+        for name, _ in self._entries():
+            yield name.decode("utf-8")
+
+    def items(self):
+        """ All entries in insertion order (a single pass over the data area) """
+        for name, number in self._entries():
+            yield name.decode("utf-8"), number.decode("utf-8")
+
+    def __len__(self):
+        return self._count
+
+    def flush(self):
+        """ Write changes to the file """
+        self._mm.flush()
+
+    def close(self):
+        """ Write changes and release the file """
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
@@ -3,11 +3,14 @@ Simple client server unit test
 """
 
 import logging
+import os
+import tempfile
 import threading
 import unittest
 
 import clientserver
 from context import lab_logging
+from telefonbuch_store import MappedStore
 
 lab_logging.setup(stream_level=logging.INFO)
 
@@ -41,6 +44,88 @@ class TestEchoService(unittest.TestCase):
         msg = self.client.GET("Schmidt")
         self.assertEqual(msg, "Schmidt not found\n")
 
+    def test_srv_get_without_name(self):
+        """Test GET without a name, the connection keeps working"""
+        self.assertEqual(self.client.call("GET"), "invalid request GET\n")
+        self.assertTrue(self.client.call("GET Hakim").startswith("Hakim: "))
+
+    def test_srv_invalid_utf8(self):
+        """Test a request that is not valid UTF-8, the server keeps serving"""
+        self.client.sock.sendall(clientserver.HEADER.pack(2) + b"\xff\xfe")
+        self.assertEqual(self.client._receive(), "invalid request\n")  # pylint: disable=protected-access
+        self.assertTrue(self.client.call("GET Hakim").startswith("Hakim: "))
+        other = clientserver.Client()
+        self.assertTrue(other.call("GET Weber").startswith("Weber: "))
+        other.close()
+
+    def test_srv_pipeline(self):
+        """Test several requests sent at once over one connection, answered in request order"""
+        responses = self.client.pipeline(["GET Hakim", "GET Nobody", "GETALL", "GET Weber"])
+        self.assertEqual(len(responses), 4)
+        self.assertTrue(responses[0].startswith("Hakim: "))
+        self.assertEqual(responses[1], "Nobody not found\n")
+        self.assertIn("Weber:", responses[2])
+        self.assertTrue(responses[3].startswith("Weber: "))
+        self.assertTrue(self.client.call("GET Hakim").startswith("Hakim: "))  # connection is reused
+
+    def test_srv_getall_long(self):
+        """Test a GETALL response much longer than a single receive (streamed in chunks)"""
+        names = [f"Long{i:04d}" for i in range(2000)]
+        self.client.pipeline([f"PUT {name} {'0' * 50}" for name in names])
+        try:
+            msg = self.client.call("GETALL")
+            self.assertGreater(len(msg), clientserver.CHUNK)
+            self.assertIn("Hakim:", msg)
+            self.assertIn(f"Long1999:{'0' * 50}", msg)
+            self.assertEqual(len([line for line in msg.split("\n") if line.startswith("Long")]), 2000)
+        finally:
+            self.client.pipeline([f"DELETE {name}" for name in names])
+
+    def test_srv_search(self):
+        """Test SEARCH: all names starting with the prefix (sorted), the number of matches first"""
+        self.assertEqual(self.client.SEARCH("Schmi"),
+                         "4 matches\nSchmid: 50220\nSchmidt: 49233\nSchmitt: 50154\nSchmitz: 50176\n")
+        self.assertEqual(self.client.call("SEARCH Schmid"), "2 matches\nSchmid: 50220\nSchmidt: 49233\n")
+        self.assertEqual(self.client.call("SEARCH Schmidt"), "1 matches\nSchmidt: 49233\n")
+        self.assertEqual(self.client.call("SEARCH Nobody"), "0 matches\n")
+        self.assertEqual(self.client.call("SEARCH Zz"), "0 matches\n")  # after all names
+
+    def test_srv_search_pages(self):
+        """Test SEARCH offset and limit, clamped to the matches"""
+        self.assertEqual(self.client.SEARCH("Schmi", 1, 2), "4 matches\nSchmidt: 49233\nSchmitt: 50154\n")
+        self.assertEqual(self.client.SEARCH("Schmi", 3, 10), "4 matches\nSchmitz: 50176\n")
+        self.assertEqual(self.client.SEARCH("Schmi", 10, 10), "4 matches\n")
+        self.assertEqual(self.client.SEARCH("Schmi", -5, 1), "4 matches\nSchmid: 50220\n")
+        self.assertEqual(self.client.SEARCH("Schmi", 0, -1), "4 matches\n")
+        self.assertEqual(self.client.call("SEARCH Schmi"), self.client.SEARCH("Schmi", 0, clientserver.PAGE_SIZE))
+
+    def test_srv_search_invalid(self):
+        """Test SEARCH with offset or limit that are no numbers"""
+        self.assertEqual(self.client.call("SEARCH Schmi x"), "invalid request SEARCH Schmi x\n")
+        self.assertEqual(self.client.call("SEARCH Schmi 0 y"), "invalid request SEARCH Schmi 0 y\n")
+
+    def test_srv_search_max_page_size(self):
+        """Test that a SEARCH page holds at most MAX_PAGE_SIZE entries"""
+        names = [f"Page{i:04d}" for i in range(1500)]
+        self.client.pipeline([f"PUT {name} {i}" for i, name in enumerate(names)])
+        try:
+            lines = self.client.call("SEARCH Page 0 5000").split("\n")
+            self.assertEqual(lines[0], "1500 matches")
+            self.assertEqual(len([line for line in lines[1:] if line]), clientserver.MAX_PAGE_SIZE)
+            self.assertEqual(lines[clientserver.MAX_PAGE_SIZE], "Page0999: 999")
+        finally:
+            self.client.pipeline([f"DELETE {name}" for name in names])
+
+    def test_srv_put_delete(self):
+        """Test PUT and DELETE requests"""
+        self.assertEqual(self.client.PUT("Testperson", "0711 123"), "Testperson stored\n")
+        self.assertEqual(self.client.GET("Testperson"), "Testperson: 0711 123\n")
+        self.assertIn("Testperson:0711 123", self.client.GETALL())
+        self.assertEqual(self.client.DELETE("Testperson"), "Testperson deleted\n")
+        self.assertEqual(self.client.GET("Testperson"), "Testperson not found\n")
+        self.assertEqual(self.client.DELETE("Testperson"), "Testperson not found\n")
+        self.assertEqual(self.client.call("PUT Testperson"), "invalid request PUT Testperson\n")
+
     def tearDown(self):
         self.client.close()  # terminate client after each test
 
@@ -50,5 +135,73 @@ class TestEchoService(unittest.TestCase):
         cls._server_thread.join()  # wait for server thread to terminate
 
 
+class TestMappedStore(unittest.TestCase):
+    """Test the file based phone directory store"""
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "telefonbuch.store")
+        self.store = MappedStore(self.path)
+
+    def used_slots(self):
+        return sum(1 for i in range(self.store._slots) if self.store._slot(i))  # pylint: disable=protected-access
+
+    def test_reopen(self):
+        """Test that entries, changes and deletions survive closing the store"""
+        for i in range(1000):
+            self.store[f"name{i}"] = str(i)
+        self.store["name1"] = "changed"
+        del self.store["name2"]
+        self.store.close()
+        self.store = MappedStore(self.path)
+        self.assertEqual(len(self.store), 999)
+        self.assertEqual(self.store["name1"], "changed")
+        self.assertEqual(self.store["name999"], "999")
+        self.assertNotIn("name2", self.store)
+        self.assertEqual(list(self.store)[:2], ["name0", "name3"])  # insertion order, name1 was re-appended
+
+    def test_used_slots_while_growing(self):
+        """Test that the count of used slots stays exact when the file grows"""
+        for i in range(3000):
+            self.store[f"name{i}"] = str(i) * 20  # long numbers, the file grows several times
+        self.assertEqual(self.store._used, self.used_slots())  # pylint: disable=protected-access
+
+    def test_updates_compact(self):
+        """Test that updates changing the size of numbers do not grow the file without bound"""
+        for i in range(100):
+            self.store[f"name{i}"] = str(i)
+        for round_ in range(500):
+            for i in range(100):
+                self.store[f"name{i}"] = "0" * (round_ % 5 + 1)
+        self.assertLess(os.path.getsize(self.path), 1 << 20)
+        self.assertEqual(self.store["name42"], "0" * 5)
+        self.assertEqual(len(self.store), 100)
+
+    def test_too_long(self):
+        """Test that names and numbers beyond the record limit are rejected without changing the store"""
+        self.store["name"] = "1"
+        with self.assertRaises(ValueError):
+            self.store["name"] = "1" * 70000
+        with self.assertRaises(ValueError):
+            self.store["x" * 70000] = "1"
+        self.assertEqual(self.store["name"], "1")
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(self.store._dead, 0)  # pylint: disable=protected-access
+
+    def test_dead_record_missing(self):
+        """Test that a slot pointing to a dead record reads as missing"""
+        self.store["name"] = "1"
+        _, offset = self.store._probe(b"name")  # pylint: disable=protected-access
+        self.store._release(offset)  # pylint: disable=protected-access
+        with self.assertRaises(KeyError):
+            self.store["name"]  # pylint: disable=pointless-statement
+        self.assertNotIn("name", self.store)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,2 +1,5 @@
 OK = '1'
 APPEND = '2'
+ERROR = '3'
+APPEND_DELTA = '4'
+VALUE = '5'
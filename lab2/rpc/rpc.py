@@ -1,6 +1,12 @@
-import constRPC
-import time
+import asyncio
+import functools
+import itertools
+import logging
 import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import constRPC
 
 from context import lab_channel
 
@@ -10,76 +16,220 @@ class DBList:
         self.value = list(basic_list)
 
     def append(self, data):
-        self.value = self.value + [data]
+        self.value.append(data)  # in place, amortized O(1)
         return self
 
 
+class Call(Future):
+    """ Future of an RPC, acknowledged as soon as the server received the request """
+
+    def __init__(self, request_id, convert=None):
+        super().__init__()
+        self.request_id = request_id
+        self.acknowledged = threading.Event()
+        self.convert = convert  # optional function applied to the reply to obtain the result
+
+
 class Client:
+    """
+    Asynchronous RPC client. Calls return futures (see Call) and may be issued concurrently,
+    requests and replies carry a request id to match them. A single receiver thread dispatches
+    all replies, so any number of calls can be in flight.
+    """
+
     def __init__(self):
         self.chan = lab_channel.Channel()
         self.client = self.chan.join('client')
         self.server = None
+        self.timeout = 1  # seconds between checks for stop while no replies arrive
+        self._calls = {}  # pending calls by request id
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._running = False
+        self._receiver = None
 
     def run(self):
         self.chan.bind(self.client)
         self.server = self.chan.subgroup('server')
+        self._running = True
+        self._receiver = threading.Thread(target=self._receive, name='rpc-receiver', daemon=True)
+        self._receiver.start()
 
     def stop(self):
+        self._running = False
+        if self._receiver is not None:
+            self._receiver.join()
+        else:  # never run, the member is not bound yet
+            self.chan.bind(self.client)
+        with self._lock:
+            calls, self._calls = self._calls, {}
+        for call in calls.values():
+            call.set_exception(ConnectionError('client stopped'))
         self.chan.leave('client')
 
-    def append(self, data, db_list, callback):
+    def _receive(self):
+        """ Dispatch replies to their pending calls """
+        while self._running:
+            msgrcv = self.chan.receive_from(self.server, self.timeout)
+            if msgrcv is None:
+                continue
+            reply = msgrcv[1]
+            with self._lock:
+                call = self._calls.get(reply[1])
+                if call is not None and reply[0] != constRPC.OK:
+                    del self._calls[reply[1]]
+            if call is None:
+                continue  # reply to an unknown (or stopped) call
+            call.acknowledged.set()
+            if reply[0] == constRPC.OK:
+                continue  # result follows
+            if reply[0] == constRPC.ERROR:
+                call.set_exception(RuntimeError(reply[2]))
+            elif call.convert is not None:
+                call.set_result(call.convert(reply[2]))
+            else:
+                call.set_result(reply[2])
+
+    def call(self, *request, convert=None):
+        """
+        Send a request to the server.
+        :param request: request type and parameters
+        :param convert: optional function applied to the reply to obtain the result
+        :return: Call future of the result
+        """
+        call = Call(next(self._ids), convert)
+        with self._lock:
+            self._calls[call.request_id] = call
+        self.chan.send_to(self.server, (request[0], call.request_id) + request[1:])  # send msg to server
+        return call
+
+    def append(self, data, db_list, callback=None, delta=False):
+        """
+        Append data to a list remotely.
+        In delta mode the server keeps the list (one per client) and db_list is a local copy of it (start empty):
+        only its length is sent and only the items it misses are returned, they are appended to db_list in place.
+        Otherwise db_list is sent and a new list is returned.
+        :return: Call future of the resulting list
+        """
         assert isinstance(db_list, DBList)
-        msglst = (constRPC.APPEND, data, db_list)  # message payload
-        self.chan.send_to(self.server, msglst)  # send msg to server
-        
-        # wait for ACK response
-        msgrcv = self.chan.receive_from(self.server)
-        
-        if not constRPC.OK == msgrcv[1][0]:
-            print("No ACK received")
-            return None
-        
-        # Define thread function for waiting on result
-        def wait_for_response():
-            result_msg = self.chan.receive_from(self.server)  # wait for response
-            callback(result_msg[1])  # pass it to callback
-        
-        # Start thread to wait for final answer
-        waitThread = threading.Thread(target=wait_for_response)
-        waitThread.start()
-        
-        return waitThread
+        if delta:
+            def apply(reply):  # reply: new length and the items from the length sent on
+                missing = reply[0] - len(db_list.value)  # replies of concurrent calls overlap
+                if missing > 0:
+                    db_list.value.extend(reply[1][-missing:])
+                return db_list
+
+            call = self.call(constRPC.APPEND_DELTA, data, len(db_list.value), convert=apply)
+        else:
+            call = self.call(constRPC.APPEND, data, db_list)
+        if callback is not None:
+            call.add_done_callback(lambda done: callback(done.result()))
+        return call
+
+    def value(self, start=None, stop=None):
+        """
+        Read a range of the list the server keeps for this client (see delta mode of append).
+        :return: Call future of the list of items from start to stop
+        """
+        return self.call(constRPC.VALUE, start, stop)
+
+    async def append_async(self, data, db_list):
+        return await asyncio.wrap_future(self.append(data, db_list))
+
+
+def execute(request, delay):
+    """ Perform a request (in a worker thread or process) """
+    # Simulate long-running computation
+    time.sleep(delay)
+    if constRPC.APPEND == request[0]:
+        return Server.append(request[2], request[3])  # do local call
+    return None  # changes of server-side lists are applied by the server process (see Server.append_delta)
 
 
 class Server:
-    def __init__(self):
+    """
+    RPC server dispatching requests to a pool of worker threads (or processes).
+    Requests are acknowledged as soon as they are taken off the channel and answered as they complete.
+    At most max_in_flight requests are taken at a time, further requests wait in the channel.
+    For delta appends and ranged reads the server keeps a list per client.
+    """
+
+    def __init__(self, workers=4, max_in_flight=64, processes=False, delay=10):
         self.chan = lab_channel.Channel()
         self.server = self.chan.join('server')
         self.timeout = 3
+        self.delay = delay  # simulated duration of a call in seconds
+        self.executor = ProcessPoolExecutor(workers) if processes else ThreadPoolExecutor(workers)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.lists = {}  # server-side list per client
+        self.lock = threading.Lock()  # protects the lists (changed by completion callbacks)
+        self.logger = logging.getLogger('vs2lab.lab2.rpc.Server')
 
     @staticmethod
     def append(data, db_list):
         assert isinstance(db_list, DBList)  # - Make sure we have a list
         return db_list.append(data)
 
+    def append_delta(self, client, data, length):
+        # append to the list of the client, return the new length and the items the client misses
+        # (from its length on, more than the appended item if it missed earlier replies)
+        with self.lock:
+            db_list = self.lists.setdefault(client, DBList([]))
+            if length > len(db_list.value):
+                raise ValueError('client list is longer than server list ({} > {})'.format(length, len(db_list.value)))
+            db_list.append(data)
+            return len(db_list.value), db_list.value[length:]
+
+    def value(self, client, start, stop):
+        # items from start to stop of the list of the client
+        with self.lock:
+            return self.lists[client].value[start:stop] if client in self.lists else []
+
     def run(self):
         self.chan.bind(self.server)
         while True:
+            self.in_flight.acquire()  # wait for a free slot (backpressure)
             msgreq = self.chan.receive_from_any(self.timeout)  # wait for any request
-            if msgreq is not None:
-                client = msgreq[0]  # see who is the caller
-                msgrpc = msgreq[1]  # fetch call & parameters
-                if constRPC.APPEND == msgrpc[0]:  # check what is being requested
-                    # Send ACK immediately to acknowledge request receipt
-                    self.chan.send_to({client}, (constRPC.OK,))
-                    
-                    # Simulate long-running computation (10 seconds)
-                    time.sleep(10)
-                    
-                    # Perform the actual operation
-                    result = self.append(msgrpc[1], msgrpc[2])  # do local call
-                    
-                    # Send the final result
-                    self.chan.send_to({client}, (constRPC.APPEND, result))  # return response
-                else:
-                    pass  # unsupported request, simply ignore
+            if msgreq is None:
+                self.in_flight.release()
+                continue
+            client = msgreq[0]  # see who is the caller
+            msgrpc = msgreq[1]  # fetch call, request id & parameters
+            if msgrpc[0] == constRPC.VALUE:  # reads are answered at once
+                try:
+                    self.chan.send_to({client}, (constRPC.VALUE, msgrpc[1], self.value(client, msgrpc[2], msgrpc[3])))
+                except AssertionError:
+                    self.logger.warning('Client has already left the channel.')
+                finally:
+                    self.in_flight.release()
+            elif msgrpc[0] in (constRPC.APPEND, constRPC.APPEND_DELTA):  # check what is being requested
+                # Send ACK immediately to acknowledge request receipt
+                try:
+                    self.chan.send_to({client}, (constRPC.OK, msgrpc[1]))
+                except AssertionError:
+                    self.logger.warning('Client has already left the channel.')
+                    self.in_flight.release()  # the result could not be delivered
+                    continue
+
+                # Perform the operation in the pool and reply when done
+                result = self.executor.submit(execute, msgrpc, self.delay)
+                finish = None
+                if msgrpc[0] == constRPC.APPEND_DELTA:  # applied to the server-side list after the computation
+                    finish = functools.partial(self.append_delta, client, msgrpc[2], msgrpc[3])
+                result.add_done_callback(functools.partial(self.reply, client, msgrpc[0], msgrpc[1], finish))
+            else:
+                self.in_flight.release()  # unsupported request, simply ignore
+
+    def reply(self, client, kind, request_id, finish, result):
+        """ Send the result (or error) of a completed request, finish optionally produces the result instead """
+        try:
+            try:
+                value = result.result()  # raises the error of the computation
+                response = (kind, request_id, value if finish is None else finish())
+            except Exception as error:  # pylint: disable=broad-except
+                response = (constRPC.ERROR, request_id, repr(error))
+            self.chan.send_to({client}, response)  # return response
+        except AssertionError:
+            self.logger.warning('Client has already left the channel.')
+        finally:
+            self.in_flight.release()
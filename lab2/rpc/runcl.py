@@ -4,12 +4,9 @@ import time
 
 from context import lab_logging
 
-def callback(result_tuple):
-    # result_tuple is (APPEND, DBList)
-    if len(result_tuple) > 1:
-        print("Result: {}".format(result_tuple[1].value))
-    else:
-        print("Result: {}".format(result_tuple))
+def callback(result):
+    # result is the extended DBList
+    print("Result: {}".format(result.value))
 
 lab_logging.setup(stream_level=logging.INFO)
 
@@ -17,10 +14,19 @@ cl = rpc.Client()
 cl.run()
 
 base_list = rpc.DBList({'foo'})
-cl.append('bar', base_list, callback)
+call = cl.append('bar', base_list, callback)  # returns a future immediately
+
+mirror = rpc.DBList([])  # local copy of a list kept by the server
+delta_call = cl.append('baz', mirror, delta=True)  # only the missing items are returned
 
 for i in range(15):
-    print("Client is doing other work...")
+    if call.acknowledged.is_set() and not call.done():
+        print("Client is doing other work (call acknowledged)...")
+    else:
+        print("Client is doing other work...")
     time.sleep(1)
 
+print("Mirror: {}".format(delta_call.result().value))
+print("Server list [0:1]: {}".format(cl.value(0, 1).result()))
+
 cl.stop()
@@ -0,0 +1,40 @@
+import rpyc
+
+
+class BatchedDBList:
+    """
+    Client side wrapper of a remote DBList that coalesces appends.
+    Appended items are buffered and sent in batches with a single asynchronous extend call,
+    so the client neither waits for nor pays a round trip per item.
+    """
+
+    def __init__(self, dblist, batch_size=1000):
+        self.dblist = dblist  # remote service (conn.root)
+        self.batch_size = batch_size
+        self.buffer = []  # items not sent yet
+        self.pending = []  # results of sent batches
+        self._extend = rpyc.async_(dblist.extend)
+
+    def append(self, data):
+        self.buffer.append(data)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def extend(self, items):
+        for data in items:
+            self.append(data)
+
+    def flush(self):
+        # send buffered items as one batch (as tuple, i.e. by value)
+        if self.buffer:
+            self.pending.append(self._extend(tuple(self.buffer)))
+            self.buffer = []
+
+    def wait(self):
+        # send remaining items and wait for all batches, returns the resulting length of the remote list
+        self.flush()
+        length = None
+        for result in self.pending:
+            length = result.value  # raises remote errors
+        self.pending = []
+        return length
@@ -2,6 +2,7 @@ import logging
 
 import constRPYC
 import rpyc
+from batch import BatchedDBList
 
 from context import lab_logging
 
@@ -22,3 +23,18 @@ logger.info("Append 4: '{}'".format(str(ret)))
 
 ret = dblist.value()  # Print the result
 logger.info("Stored value: '{}'".format(str(ret)))
+
+ret = dblist.append(6, since=2)  # append and only fetch items from index 2 on
+logger.info("Append 6 (delta): '{}'".format(str(ret)))
+
+ret = dblist.value(1, 3)  # fetch a range of items
+logger.info("Stored value [1:3]: '{}'".format(str(ret)))
+
+ret = dblist.extend((8, 10, 12))  # append several elements in one call (tuple: sent by value)
+logger.info("Extend 8, 10, 12: '{}'".format(str(ret)))
+
+batched = BatchedDBList(dblist)  # coalesce many appends into few asynchronous calls
+for i in range(10000):
+    batched.append(i)
+ret = batched.wait()
+logger.info("Appended 10000 elements in batches, length: '{}'".format(str(ret)))
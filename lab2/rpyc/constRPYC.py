@@ -1,2 +1,3 @@
 SERVER = "127.0.0.1"
 PORT = 12345
+THREADS = 20  # size of the server thread pool
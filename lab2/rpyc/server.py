@@ -1,9 +1,20 @@
+"""
+DBList service
+- usage: server.py [shared], 'shared' lets all connections use one list (otherwise each connection has its own)
+- connections are served by a fixed pool of threads (see constRPYC.THREADS)
+- in shared mode, the list itself is only returned as a copy (concurrent connections change it)
+"""
+
 import logging
+import socket
+import sys
+import threading
 from typing import List, Any
 
 import constRPYC
 import rpyc
-from rpyc.utils.server import ThreadedServer
+from rpyc.utils.helpers import classpartial
+from rpyc.utils.server import ThreadPoolServer
 
 from context import lab_logging
 
@@ -11,19 +22,93 @@ lab_logging.setup()
 logger = logging.getLogger("vs2lab.lab2.rpyc.server")
 
 
+class Store:
+    def __init__(self, shared=False):
+        self.lock = threading.Lock()  # serializes changes by concurrent connections
+        self.shared = shared  # used by concurrent connections
+        self.value: List[Any] = []
+
+
+class PoolServer(ThreadPoolServer):
+    """
+    ThreadPoolServer without its polling delay: the polling thread sleeps in poll() for up to 0.1 s and
+    only watches connections registered before, so a connection going back to idle waited for the next
+    poll to be served again. Here a socket pair wakes up the polling thread whenever a connection goes
+    idle (a socket and not a pipe, since the select based poll on Windows only accepts sockets).
+    Overrides internals of the ThreadPoolServer of rpyc 6.0.2, the version pinned in the Pipfile.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wakeup_receive, self._wakeup_send = socket.socketpair()
+        self._wakeup_receive.setblocking(False)
+        self._wakeup_send.setblocking(False)
+        self.poll_object.register(self._wakeup_receive.fileno(), "r")
+
+    def _add_inactive_connection(self, fd):
+        super()._add_inactive_connection(fd)
+        try:
+            self._wakeup_send.send(b"\0")  # restart the poll, now including fd
+        except BlockingIOError:
+            pass  # wakeup already pending
+
+    def _handle_poll_result(self, connlist):
+        wakeup = self._wakeup_receive.fileno()
+        if any(fd == wakeup for fd, _ in connlist):
+            try:
+                while self._wakeup_receive.recv(4096):
+                    pass
+            except BlockingIOError:
+                pass
+        super()._handle_poll_result([(fd, evt) for fd, evt in connlist if fd != wakeup])
+
+    def close(self):
+        super().close()
+        self._wakeup_receive.close()
+        self._wakeup_send.close()
+
+
 class DBList(rpyc.Service):
-    value: List[Any] = [] # not visible from remote
+    def __init__(self, store=None):
+        # not visible from remote (shared store or one list per connection)
+        self.store = store if store is not None else Store()
 
     # visible functions start with 'exposed_'
-    def exposed_append(self, data):
-        self.value = self.value + [data]
-        return self.value
+    def exposed_append(self, data, since=None):
+        # append in place, returns the list (by reference, a tuple copy for a shared store) or, if since is given,
+        # the new length and a tuple of the items from index since on (by value)
+        with self.store.lock:
+            self.store.value.append(data)
+            if since is None:
+                return self._value()
+            return len(self.store.value), tuple(self.store.value[since:])
+
+    def exposed_extend(self, items, since=None):
+        # append all items in place (pass a tuple, it is sent by value, a list would be iterated remotely),
+        # returns the new length or, if since is given, the new length and a tuple of the items from index since on
+        items = tuple(items)
+        with self.store.lock:
+            self.store.value.extend(items)
+            if since is None:
+                return len(self.store.value)
+            return len(self.store.value), tuple(self.store.value[since:])
+
+    def exposed_value(self, start=None, stop=None):
+        # returns the list (by reference, a tuple copy for a shared store) or, if a range is given,
+        # a tuple of its items (by value)
+        with self.store.lock:
+            if start is None and stop is None:
+                return self._value()
+            return tuple(self.store.value[start:stop])
 
-    def exposed_value(self):
-        return self.value
+    def _value(self):
+        # the list of a connection is only changed by its own (sequential) calls and can be passed by reference,
+        # a shared list is changed concurrently, remote reads of it would not hold the lock (call with lock held)
+        return tuple(self.store.value) if self.store.shared else self.store.value
 
 
 if __name__ == "__main__":
-    server = ThreadedServer(DBList, port=constRPYC.PORT)
+    service = classpartial(DBList, Store(shared=True)) if "shared" in sys.argv[1:] else DBList
+    server = PoolServer(service, port=constRPYC.PORT, nbThreads=constRPYC.THREADS)
     logger.info("Server starting...")
     server.start()
@@ -0,0 +1,198 @@
+"""
+Parallel background zip
+- compresses input files in chunks on a pool of processes (deflate does not run in parallel in threads)
+- streams compressed chunks into the archive in order, files are never loaded into memory as a whole
+- reports progress and throughput
+- usage: parallel_zip.py <archive> <file> [<file> ...]
+"""
+
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+CHUNK_SIZE = 1 << 20  # bytes of input per compression task
+ZIP64_LIMIT = (1 << 31) - 1  # sizes and offsets beyond need zip64 extensions (same limit as zipfile)
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+DATA_DESCRIPTOR = struct.Struct("<IIII")
+DATA_DESCRIPTOR64 = struct.Struct("<IIQQ")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<IHHHHIIH")
+END_RECORD64 = struct.Struct("<IQHHIIQQQQ")
+END_LOCATOR64 = struct.Struct("<IIQI")
+
+FLAGS = 0x08 | 0x800  # sizes and crc follow the data (data descriptor), utf-8 names
+DEFLATED = 8
+
+
+def compress(chunk, level, last):
+    """ Compress a chunk to raw deflate data (in a worker process) """
+    # chunks are compressed independently and end on a byte boundary (sync flush),
+    # so their concatenation is a valid deflate stream, the last chunk ends the stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(chunk) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def dos_time(timestamp):
+    """ Date and time of a timestamp in MS-DOS format """
+    t = time.localtime(timestamp)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1  # 1980-01-01 00:00
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+class ZipWriter:
+    """ Writes a zip archive entry by entry from precompressed (deflate) data """
+
+    def __init__(self, out):
+        self.out = out
+        self.offset = 0  # bytes written
+        self.entries = []  # central directory entries
+        self.entry = None  # entry being written
+
+    def _write(self, data):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def begin(self, name, mtime, mode, zip64):
+        """ Start an entry (sizes and crc are written by end) """
+        raw_name = name.encode("utf-8")
+        time_, date = dos_time(mtime)
+        version = 45 if zip64 else 20
+        # zip64 entries announce 8 byte sizes in the data descriptor by a zip64 extra field
+        extra = struct.pack("<HHQQ", 1, 16, 0, 0) if zip64 else b""
+        size = 0xFFFFFFFF if zip64 else 0
+        self.entry = {"name": raw_name, "time": time_, "date": date, "mode": mode, "zip64": zip64,
+                      "version": version, "offset": self.offset, "size": 0, "file_size": 0}
+        self._write(LOCAL_HEADER.pack(0x04034b50, version, FLAGS, DEFLATED, time_, date, 0, size, size,
+                                      len(raw_name), len(extra)) + raw_name + extra)
+
+    def write(self, data, file_size):
+        """ Append compressed data (of file_size uncompressed bytes) to the current entry """
+        self._write(data)
+        self.entry["size"] += len(data)
+        self.entry["file_size"] += file_size
+
+    def end(self, crc):
+        """ Finish the current entry """
+        entry, self.entry = self.entry, None
+        entry["crc"] = crc
+        file_size = entry["file_size"]
+        if entry["zip64"]:
+            self._write(DATA_DESCRIPTOR64.pack(0x08074b50, crc, entry["size"], file_size))
+        else:
+            self._write(DATA_DESCRIPTOR.pack(0x08074b50, crc, entry["size"], file_size))
+        self.entries.append(entry)
+
+    def close(self):
+        """ Write the central directory """
+        start = self.offset
+        for entry in self.entries:
+            fields = []  # zip64 values in required order (sizes, offset)
+            file_size, size, offset = entry["file_size"], entry["size"], entry["offset"]
+            if file_size > ZIP64_LIMIT or size > ZIP64_LIMIT:
+                fields += [file_size, size]
+                file_size = size = 0xFFFFFFFF
+            if offset > ZIP64_LIMIT:
+                fields.append(offset)
+                offset = 0xFFFFFFFF
+            extra = struct.pack("<HH%dQ" % len(fields), 1, 8 * len(fields), *fields) if fields else b""
+            version = 45 if fields or entry["zip64"] else 20
+            self._write(CENTRAL_HEADER.pack(0x02014b50, (3 << 8) | version, version, FLAGS, DEFLATED,
+                                            entry["time"], entry["date"], entry["crc"], size, file_size,
+                                            len(entry["name"]), len(extra), 0, 0, 0, (entry["mode"] & 0xFFFF) << 16,
+                                            offset) + entry["name"] + extra)
+        size, count = self.offset - start, len(self.entries)
+        if count >= 0xFFFF or size > ZIP64_LIMIT or start > ZIP64_LIMIT:
+            end64 = self.offset
+            self._write(END_RECORD64.pack(0x06064b50, END_RECORD64.size - 12, 45, 45, 0, 0, count, count, size, start))
+            self._write(END_LOCATOR64.pack(0x07064b50, 0, end64, 1))
+            count, size, start = min(count, 0xFFFF), min(size, 0xFFFFFFFF), min(start, 0xFFFFFFFF)
+        self._write(END_RECORD.pack(0x06054b50, 0, 0, count, count, size, start, 0))
+
+
+class ParallelZip(threading.Thread):
+    def __init__(self, infiles, outfile, workers=None, chunk_size=CHUNK_SIZE, level=6, progress=None):
+        threading.Thread.__init__(self)
+        self.infiles = [infiles] if isinstance(infiles, str) else list(infiles)
+        self.outfile = outfile
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.level = level
+        self.progress = progress  # called with bytes done, bytes total and seconds elapsed after each chunk
+        self.total = 0  # bytes to compress
+        self.done = 0  # bytes compressed
+        self.elapsed = 0.0
+        self.compressed = 0  # archive size
+
+    @property
+    def throughput(self):
+        """ Compressed input bytes per second """
+        return self.done / self.elapsed if self.elapsed else 0.0
+
+    def _chunks(self):
+        """ Read all input files sequentially, yields (file index, chunk, crc so far, last chunk of file) """
+        for index, path in enumerate(self.infiles):
+            crc = 0
+            with open(path, "rb") as f:
+                chunk = f.read(self.chunk_size)
+                while True:
+                    following = f.read(self.chunk_size)  # read ahead to detect the last chunk
+                    crc = zlib.crc32(chunk, crc)
+                    yield index, chunk, crc, not following
+                    if not following:
+                        break
+                    chunk = following
+
+    def _store(self, writer, task):
+        """ Write a compressed chunk (waits for its compression) """
+        index, size, crc, last, result = task
+        if writer.entry is None:
+            path = self.infiles[index]
+            stat = os.stat(path)
+            name = os.path.normpath(os.path.splitdrive(path)[1]).replace(os.sep, "/").lstrip("/")
+            writer.begin(name, stat.st_mtime, stat.st_mode, stat.st_size > ZIP64_LIMIT)
+        writer.write(result.result(), size)
+        if last:
+            writer.end(crc)
+        self.done += size
+        self.elapsed = time.monotonic() - self._start_time
+        if self.progress is not None:
+            self.progress(self.done, self.total, self.elapsed)
+
+    def run(self):
+        self._start_time = time.monotonic()
+        self.total = sum(os.path.getsize(path) for path in self.infiles)
+        with ProcessPoolExecutor(self.workers) as pool, open(self.outfile, "wb") as out:
+            writer = ZipWriter(out)
+            window = deque()  # chunks being compressed (in archive order), bounded to limit memory use
+            for index, chunk, crc, last in self._chunks():
+                window.append((index, len(chunk), crc, last, pool.submit(compress, chunk, self.level, last)))
+                if len(window) >= 2 * self.workers:
+                    self._store(writer, window.popleft())
+            while window:
+                self._store(writer, window.popleft())
+            writer.close()
+            self.compressed = writer.offset
+        self.elapsed = time.monotonic() - self._start_time
+        print('Finished background zip of: {} ({:.1f} MB/s)'.format(
+            ", ".join(self.infiles), self.throughput / (1 << 20)))
+
+
+if __name__ == "__main__":
+    def report(done, total, elapsed):
+        print("\r{:5.1f}% {:8.1f} MB/s".format(100 * done / (total or 1), done / (elapsed or 1) / (1 << 20)),
+              end="", flush=True)
+
+    background = ParallelZip(sys.argv[2:] or ["mydata.txt"], sys.argv[1] if len(sys.argv) > 1 else "myarchive.zip",
+                             progress=report)
+    background.start()
+    print('The main program continues to run in foreground.')
+
+    background.join()  # Wait for the background task to finish
+    print('Main program waited until background was done.')
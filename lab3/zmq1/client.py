@@ -1,20 +1,28 @@
-import zmq
+import json
 import time
 
+import zmq
+
 import constRR
 
 context = zmq.Context()
 
 address = "tcp://" + constRR.HOST + ":" + constRR.PORT1  # how and where to connect
-requester = context.socket(zmq.REQ)  # create request socket
+requester = context.socket(zmq.DEALER)  # create dealer socket, requests need not wait for replies
 
 requester.connect(address)  # request connection and go on 
 
-for i in range(3): # 3 times
-    requester.send(b"Hello world")  # send message and go on
+for i in range(3): # 3 requests at once
+    requester.send_multipart([str(i + 1).encode(), b"Hello world"])  # send request id and message and go on
     print("Sent {}. request".format(i+1))  # print ack
-    message = requester.recv()  # block until response
-    print(message.decode() + " " + str(i+1) + " time")  # print result
+
+for _ in range(3):
+    request_id, message = requester.recv_multipart()  # block until a response, in any order
+    print(message.decode() + " " + request_id.decode() + " time")  # print result
+
+requester.send_multipart([b"0", b"METRICS"])  # ask for the load of the server workers
+print(json.dumps(json.loads(requester.recv_multipart()[1]), indent=2))
 
 time.sleep(1) 
-requester.send(b"STOP")  # tell server to stop
+requester.send_multipart([b"0", b"STOP"])  # tell server to stop
+time.sleep(0.1)  # let the message leave before the context ends
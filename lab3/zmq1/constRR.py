@@ -1,3 +1,6 @@
 HOST = "127.0.0.1"
 PORT1 = "50007"
 PORT2 = "50008"
+BACKEND = "inproc://workers"  # broker to workers
+WORKERS = 4  # worker threads of the server
+MAX_QUEUE = 1000  # requests waiting for a worker before the server stops reading
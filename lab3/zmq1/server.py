@@ -1,3 +1,8 @@
+import json
+import threading
+import time
+from collections import deque
+
 import zmq
 
 import constRR
@@ -5,16 +10,100 @@ import constRR
 address1 = "tcp://" + constRR.HOST + ":" + constRR.PORT1  # how and where to connect
 address2 = "tcp://" + constRR.HOST + ":" + constRR.PORT2  # how and where to connect
 
-context = zmq.Context()
-reply_socket = context.socket(zmq.REP)  # create reply socket
- 
-reply_socket.bind(address1)  # bind socket to address
-reply_socket.bind(address2)  # bind socket to address
-
-while True:
-    message = reply_socket.recv()  # wait for incoming message
-    if b"STOP" not in message:  # if not to stop...
+
+def worker(context, name):
+    """ Serve requests handed out by the broker until it sends a stop message """
+    socket = context.socket(zmq.REQ)  # create request socket, the broker answers with work
+    socket.setsockopt(zmq.IDENTITY, name)  # worker name for the broker and its metrics
+    socket.connect(constRR.BACKEND)
+    socket.send(b"READY")  # announce the worker
+    while True:
+        frames = socket.recv_multipart()  # envelope frames (client and request id) and the message
+        if len(frames) == 1:  # message without envelope: broker stops
+            break
+        message = frames[-1]
         print("Received " + message.decode())
-        reply_socket.send((message.decode() + "*").encode())  # append "*" to message
-    else:  # else...
-        break  # break out of loop and end
+        socket.send_multipart(frames[:-1] + [(message.decode() + "*").encode()])  # append "*" to message
+    socket.close()
+
+
+context = zmq.Context()
+frontend = context.socket(zmq.ROUTER)  # create router socket for clients (REQ or DEALER)
+frontend.bind(address1)  # bind socket to address
+frontend.bind(address2)  # bind socket to address
+backend = context.socket(zmq.ROUTER)  # create router socket for workers
+backend.bind(constRR.BACKEND)
+
+names = [("worker-" + str(i)).encode() for i in range(constRR.WORKERS)]
+threads = [threading.Thread(target=worker, args=(context, name), daemon=True) for name in names]
+for thread in threads:
+    thread.start()
+
+idle = deque()  # workers waiting for a request (least recently used first)
+pending = deque()  # requests waiting for a worker
+started = {}  # dispatch time of the request in progress per worker
+metrics = {name.decode(): {"requests": 0, "busy": 0.0, "max": 0.0, "in_flight": 0} for name in names}
+
+
+def dispatch():
+    """ Hand out pending requests to idle workers """
+    while idle and pending:
+        name = idle.popleft()
+        started[name] = time.perf_counter()
+        metrics[name.decode()]["in_flight"] = 1
+        backend.send_multipart([name, b""] + pending.popleft())
+
+
+def report():
+    """ Per worker load: handled requests, busy seconds, longest request, current requests and share """
+    total = sum(entry["requests"] for entry in metrics.values()) or 1
+    return {"workers": {name: dict(entry, share=entry["requests"] / total) for name, entry in metrics.items()},
+            "queued": len(pending)}
+
+
+workers_only = zmq.Poller()  # while no new requests are accepted
+workers_only.register(backend, zmq.POLLIN)
+poller = zmq.Poller()
+poller.register(backend, zmq.POLLIN)
+poller.register(frontend, zmq.POLLIN)
+stopping = False
+while not stopping or len(idle) < len(names):  # after STOP wait for the requests in progress
+    # read new requests only while the queue has room (otherwise they wait in the socket buffers)
+    if stopping or len(pending) >= constRR.MAX_QUEUE:
+        events = dict(workers_only.poll(1000 if stopping else None))
+    else:
+        events = dict(poller.poll())
+    if not events:
+        break  # workers did not answer in time
+
+    if backend in events:  # worker is ready or replies
+        name, _, *reply = backend.recv_multipart()
+        if name in started:
+            duration = time.perf_counter() - started.pop(name)
+            entry = metrics[name.decode()]
+            entry["requests"] += 1
+            entry["busy"] += duration
+            entry["max"] = max(entry["max"], duration)
+            entry["in_flight"] = 0
+        if reply != [b"READY"]:
+            frontend.send_multipart(reply)  # envelope routes the reply back to the client
+        idle.append(name)
+
+    if frontend in events:  # client request: [client, (empty delimiter or request id), message]
+        request = frontend.recv_multipart()
+        message = request[-1]
+        if b"STOP" in message:  # if to stop...
+            stopping = True  # no new requests, finish the running ones
+        elif message == b"METRICS":  # load metrics are answered by the broker itself
+            frontend.send_multipart(request[:-1] + [json.dumps(report()).encode()])
+        else:
+            pending.append(request)
+
+    if not stopping:
+        dispatch()
+
+for name in idle:
+    backend.send_multipart([name, b"", b"STOP"])  # message without envelope stops the worker
+for thread in threads:
+    thread.join(1)
+print(json.dumps(report(), indent=2))
@@ -0,0 +1,129 @@
+"""
+Throughput and latency benchmark for publish-subscribe fan-out
+- publishes records on a number of topics as fast as possible, in batches of records per message
+- N subscriber processes receive all topics, optionally conflated and optionally slowed down per message
+- reports per subscriber: received and lost records, throughput and latency percentiles, optionally as JSON file
+- usage: benchmark.py [-h] (see options)
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import queue
+import time
+
+import zmq
+
+import constPS
+import pubsub
+from context import lab_stats
+
+END = b"END"  # topic announcing the end of the benchmark
+
+
+def run_subscriber(args, address, topics, ready, results):
+    """ Receive until the end is published, report what was received """
+    context = zmq.Context()
+    subscriber = pubsub.Subscriber(context, address, topics + [END], args.hwm, args.conflate)
+    ready.put(None)
+    messages = records = 0
+    latencies = []
+    started = None
+    done = False
+    while not done:
+        received = subscriber.receive(timeout=10)
+        if not received:
+            break  # publisher is gone
+        for topic, batch in received:
+            now = time.time()
+            if topic == END:
+                done = True
+                break
+            if started is None:
+                started = now
+            messages += 1
+            records += len(batch)
+            latencies.append(now - batch[0][1])  # records of a batch are published at once
+            if args.slow:
+                time.sleep(args.slow)
+    duration = (time.time() - started) if started else 0
+    latencies.sort()
+    results.put({
+        "messages": messages,
+        "records": records,
+        "lost": args.records - records,  # dropped at a high-water mark or conflated
+        "throughput": records / duration if duration else 0,
+        "p50_ms": 1000 * lab_stats.percentile(latencies, 50) if latencies else None,
+        "p99_ms": 1000 * lab_stats.percentile(latencies, 99) if latencies else None,
+        "max_ms": 1000 * latencies[-1] if latencies else None,
+    })
+    subscriber.close()
+    context.term()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish-subscribe fan-out benchmark")
+    parser.add_argument("--subscribers", type=int, default=4, help="number of subscriber processes")
+    parser.add_argument("--records", type=int, default=1000000, help="records to publish")
+    parser.add_argument("--batch", type=int, default=10, help="records per message")
+    parser.add_argument("--topics", type=int, default=10, help="number of topics")
+    parser.add_argument("--hwm", type=int, default=constPS.HWM, help="high-water mark (messages)")
+    parser.add_argument("--conflate", action="store_true", help="subscribers keep the last message per topic")
+    parser.add_argument("--slow", type=float, default=0, help="seconds a subscriber spends per message")
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args()
+
+    address = "tcp://" + constPS.HOST + ":" + constPS.PORT
+    topics = [("T{:04d}".format(i)).encode() for i in range(args.topics)]
+    context = zmq.Context()
+    publisher = pubsub.Publisher(context, address, args.hwm)
+
+    ready, results = mp.Queue(), mp.Queue()
+    subscribers = [mp.Process(target=run_subscriber, args=(args, address, topics, ready, results))
+                   for _ in range(args.subscribers)]
+    for subscriber in subscribers:
+        subscriber.start()
+    for _ in subscribers:
+        ready.get()
+    time.sleep(1)  # wait to allow all subscriptions to arrive
+
+    values = [float(i) for i in range(args.batch)]
+    started = time.time()
+    messages = 0
+    while publisher.sequence < args.records:
+        publisher.publish(topics[messages % len(topics)], values[:args.records - publisher.sequence])
+        messages += 1
+    duration = time.time() - started
+
+    reports = []
+    while len(reports) < len(subscribers):  # the end message is dropped as well when a subscriber lags behind
+        publisher.publish(END, [])
+        try:
+            reports.append(results.get(timeout=0.1))
+        except queue.Empty:
+            pass
+    for subscriber in subscribers:
+        subscriber.join()
+    publisher.close()
+    context.term()
+
+    report = {
+        "config": vars(args),
+        "publisher": {"records": publisher.sequence, "messages": messages,
+                      "throughput": publisher.sequence / duration, "messages_per_s": messages / duration},
+        "subscribers": reports,
+    }
+    print(f"publisher  {publisher.sequence:10d} records {report['publisher']['throughput']:12.1f}/s "
+          f"({report['publisher']['messages_per_s']:.1f} messages/s)")
+    for result in reports:
+        latency = (f"p50 {result['p50_ms']:8.3f} ms   p99 {result['p99_ms']:8.3f} ms"
+                   if result["messages"] else "no messages")
+        print(f"subscriber {result['records']:10d} records {result['throughput']:12.1f}/s "
+              f"lost {result['lost']:10d}   {latency}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
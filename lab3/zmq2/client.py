@@ -1,15 +1,19 @@
+import datetime
+
 import zmq
 
 import constPS
+import pubsub
 
 context = zmq.Context()
-subscriber = context.socket(zmq.SUB)  # create a subscriber socket
 
 address = "tcp://" + constPS.HOST + ":" + constPS.PORT  # how and where to communicate
-subscriber.connect(address)  # connect to the server
-
-subscriber.setsockopt(zmq.SUBSCRIBE, b"TIME")  # subscribe to TIME messages
+subscriber = pubsub.Subscriber(context, address, [b"TIME"])  # subscribe to TIME messages
 
-for i in range(5):  # Five iterations
-    time = subscriber.recv()  # receive a message
-    print(time)
+received = 0
+while received < 5:  # Five messages
+    for topic, records in subscriber.receive():  # receive all waiting messages
+        for sequence, sent, value in records:
+            time = (datetime.datetime.min + datetime.timedelta(seconds=value)).time()
+            print(topic.decode(), time, "(#{})".format(sequence))
+        received += 1
@@ -1,15 +1,19 @@
+import datetime
+
 import zmq
 
 import constPS
+import pubsub
 
 context = zmq.Context()
-subscriber = context.socket(zmq.SUB)  # create a subscriber socket
 
 address = "tcp://" + constPS.HOST + ":" + constPS.PORT  # how and where to communicate
-subscriber.connect(address)  # connect to the server
-
-subscriber.setsockopt(zmq.SUBSCRIBE, b"DATE")  # subscribe to TIME messages
+# subscribe to DATE messages, only the latest date matters if messages pile up
+subscriber = pubsub.Subscriber(context, address, [b"DATE"], conflate=True)
 
-for i in range(3):  # Five iterations
-    time = subscriber.recv()  # receive a message
-    print(time)
+received = 0
+while received < 3:  # Three messages
+    for topic, records in subscriber.receive():  # receive the last waiting message
+        for sequence, sent, value in records:
+            print(topic.decode(), datetime.date.fromordinal(int(value)), "(#{})".format(sequence))
+        received += 1
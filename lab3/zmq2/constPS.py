@@ -1,2 +1,3 @@
 HOST = "127.0.0.1"
 PORT = "50007"
+HWM = 1000  # messages queued per subscriber (publisher) or socket (subscriber) before messages are dropped
@@ -0,0 +1,82 @@
+"""
+Binary publish-subscribe messages
+- messages are multipart: a topic frame (subscriptions match its prefix) and a payload frame
+- a payload is a batch of fixed size records: sequence number, publishing time and value
+- publishers and subscribers have configurable high-water marks, messages beyond are dropped
+- subscribers receive all waiting messages at once, optionally conflated to the last message per topic
+"""
+
+import struct
+import time
+
+import zmq
+
+import constPS
+
+RECORD = struct.Struct("<Qdd")  # sequence number, publishing time (seconds since the epoch), value
+
+
+def pack(records):
+    """ Payload of a batch of (sequence number, time, value) records """
+    return b"".join([RECORD.pack(*record) for record in records])
+
+
+def unpack(payload):
+    """ Records of a payload """
+    return list(RECORD.iter_unpack(payload))
+
+
+class Publisher:
+    def __init__(self, context, address, hwm=constPS.HWM):
+        self.socket = context.socket(zmq.PUB)  # create a publisher socket
+        self.socket.setsockopt(zmq.SNDHWM, hwm)  # messages queued per subscriber
+        self.socket.bind(address)  # bind socket to the address
+        self.sequence = 0  # sequence number of the last record (over all topics)
+
+    def publish(self, topic, values):
+        """ Publish a batch of values as a single message, returns the sequence number of the last """
+        now = time.time()
+        first = self.sequence + 1
+        self.sequence += len(values)
+        self.socket.send_multipart([topic, pack((first + i, now, value) for i, value in enumerate(values))])
+        return self.sequence
+
+    def close(self):
+        self.socket.close()
+
+
+class Subscriber:
+    def __init__(self, context, address, topics, hwm=constPS.HWM, conflate=False):
+        self.socket = context.socket(zmq.SUB)  # create a subscriber socket
+        self.socket.setsockopt(zmq.RCVHWM, hwm)  # messages queued before the publisher drops
+        self.socket.connect(address)  # connect to the server
+        for topic in topics:
+            self.socket.setsockopt(zmq.SUBSCRIBE, topic)  # subscribe to topic (prefix of the topic frame)
+        self.conflate = conflate  # deliver only the last of the waiting messages per topic
+
+    def receive(self, timeout=None, max_n=1000):
+        """
+        Wait for messages and take up to max_n messages that are waiting
+        :param timeout: seconds to wait for the first message (None: forever)
+        :param max_n: maximum number of messages taken off the socket
+        :return: list of (topic, records) in arrival order (empty on timeout)
+        """
+        if not self.socket.poll(None if timeout is None else int(timeout * 1000)):
+            return []
+        messages = {} if self.conflate else []
+        for _ in range(max_n):
+            try:
+                topic, payload = self.socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            if self.conflate:
+                messages.pop(topic, None)  # the last message of a topic replaces earlier ones
+                messages[topic] = payload
+            else:
+                messages.append((topic, payload))
+        if self.conflate:
+            messages = messages.items()
+        return [(topic, unpack(payload)) for topic, payload in messages]
+
+    def close(self):
+        self.socket.close()
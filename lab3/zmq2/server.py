@@ -1,16 +1,19 @@
-import time
 import datetime
+import time
+
 import zmq
 
 import constPS
+import pubsub
 
 context = zmq.Context()
-publisher = context.socket(zmq.PUB)  # create a publisher socket
 
 address = "tcp://" + constPS.HOST + ":" + constPS.PORT  # how and where to communicate
-publisher.bind(address)  # bind socket to the address
+publisher = pubsub.Publisher(context, address)  # create a publisher bound to the address
 
 while True:
     time.sleep(5)  # wait every 5 seconds
-    publisher.send(("TIME " + str(datetime.datetime.now().time())).encode())  # publish the current time
-    publisher.send(("DATE " + str(datetime.date.today())).encode())  # publish the current date
+    now = datetime.datetime.now()
+    midnight = datetime.datetime.combine(now.date(), datetime.time())
+    publisher.publish(b"TIME", [(now - midnight).total_seconds()])  # publish the current time (seconds of the day)
+    publisher.publish(b"DATE", [now.toordinal()])  # publish the current date (day number)
@@ -5,6 +5,7 @@ Chord Application
 - Starts up a DummyChordClient
 - nodes and client run in separate processes
 - multiprocessing should work on unix and windows
+- usage: doit.py [<m> <n> [local]], 'local' runs without redis (see lab_local_channel)
 """
 
 import logging
@@ -13,9 +14,9 @@ import multiprocessing as mp
 
 import chordnode as chord_node
 import constChord
-from context import lab_channel, lab_logging
+from context import lab_channel, lab_local_channel, lab_logging
 
-lab_logging.setup(stream_level=logging.INFO)
+lab_logging.setup(stream_level=logging.INFO, queued=True)
 
 
 class DummyChordClient:
@@ -34,7 +35,7 @@ class DummyChordClient:
         import random
         
         # Get all nodes in the ring
-        nodes = {int(node.decode()) for node in self.channel.channel.smembers('node')}
+        nodes = {int(node) for node in self.channel.subgroup('node')}
         
         if not nodes:
             print("No nodes available in the ring!")
@@ -63,19 +64,23 @@ class DummyChordClient:
         # Topluca kapatma isteği gönder
         # Send STOP to all nodes to shut down the system
         self.channel.send_to(  # a final multicast
-            {i.decode() for i in list(self.channel.channel.smembers('node'))},
+            self.channel.subgroup('node'),
             constChord.STOP)
 
 
-def create_and_run(num_bits, node_class, enter_bar, run_bar):
+def create_and_run(num_bits, node_class, enter_bar, run_bar, hub=None):
     """
     Create and run a node (server or client role)
     :param num_bits: address range of the channel
     :param node_class: class of node
     :param enter_bar: barrier syncing channel population 
     :param run_bar: barrier syncing node creation
+    :param hub: shared state of a local channel (None for the redis channel)
     """
-    chan = lab_channel.Channel(n_bits=num_bits)
+    if hub is None:
+        chan = lab_channel.Channel(n_bits=num_bits)
+    else:
+        chan = lab_local_channel.LocalChannel(hub)
     node = node_class(chan)
     enter_bar.wait()  # wait for all nodes to join the channel
     node.enter()  # do what is needed to enter the ring
@@ -92,13 +97,19 @@ if __name__ == "__main__":  # if script is started from command line
         m = int(sys.argv[1])
         n = int(sys.argv[2])
 
-    # Flush communication channel
-    chan = lab_channel.Channel()
-    chan.channel.flushall()
+    # Optionally run all nodes on a local channel (no redis needed)
+    local = len(sys.argv) > 3 and sys.argv[3] == 'local'
+
+    if not local:
+        # Flush communication channel
+        lab_channel.flushall()
 
     # we need to spawn processes for support of windows
     mp.set_start_method('spawn')
 
+    # create shared state of the local channel
+    hub = lab_local_channel.LocalHub(n+1, n_bits=m) if local else None
+
     # create barriers to synchronize bootstrapping
     bar1 = mp.Barrier(n+1)  # Wait for channel population to complete
     bar2 = mp.Barrier(n+1)  # Wait for ring construction to complete
@@ -109,7 +120,7 @@ if __name__ == "__main__":  # if script is started from command line
         nodeproc = mp.Process(
             target=create_and_run,
             name="ChordNode-" + str(i),
-            args=(m, chord_node.ChordNode, bar1, bar2))
+            args=(m, chord_node.ChordNode, bar1, bar2, hub))
         children.append(nodeproc)
         nodeproc.start()
 
@@ -117,7 +128,7 @@ if __name__ == "__main__":  # if script is started from command line
     clientproc = mp.Process(
         target=create_and_run,
         name="ChordClient",
-        args=(m, DummyChordClient, bar1, bar2))
+        args=(m, DummyChordClient, bar1, bar2, hub))
     clientproc.start()
     clientproc.join()
 
@@ -5,6 +5,7 @@ Application with a critical section (CS)
 - peers run in separate processes
 - multiprocessing should work on unix and windows
 - terminates a random process to simulate a crash fault
+- usage: doit.py [<m> <n> [local]], 'local' runs without redis (see lab_local_channel)
 """
 
 import sys
@@ -15,15 +16,15 @@ import multiprocessing as mp
 
 from process import Process
 
-from context import lab_channel, lab_logging
+from context import lab_channel, lab_local_channel, lab_logging
 from constMutex import BEHAVIOR_TYPES
 
-lab_logging.setup(stream_level=logging.INFO, file_level=logging.DEBUG)
+lab_logging.setup(stream_level=logging.INFO, file_level=logging.DEBUG, queued=True)
 
 logger = logging.getLogger("vs2lab.lab5.mutex.doit")
 
 
-def create_and_run(num_bits, peer_name, peer_type, proc_class, enter_bar, run_bar):
+def create_and_run(num_bits, peer_name, peer_type, proc_class, enter_bar, run_bar, hub=None):
     """
     Create and run a peer
     :param num_bits: address range of the channel
@@ -32,8 +33,12 @@ def create_and_run(num_bits, peer_name, peer_type, proc_class, enter_bar, run_ba
     :param node_class: class of peer
     :param enter_bar: barrier syncing channel population 
     :param run_bar: barrier syncing bootstrap
+    :param hub: shared state of a local channel (None for the redis channel)
     """
-    chan = lab_channel.Channel(n_bits=num_bits)
+    if hub is None:
+        chan = lab_channel.Channel(n_bits=num_bits)
+    else:
+        chan = lab_local_channel.LocalChannel(hub)
     proc = proc_class(chan)
     enter_bar.wait()  # wait for all peers to join the channel
     proc.init(peer_name, peer_type)  # do some bootstrapping
@@ -50,13 +55,19 @@ if __name__ == "__main__":  # if script is started from command line
         m = int(sys.argv[1])
         n = int(sys.argv[2])
 
-    # Flush communication channel
-    chan = lab_channel.Channel()
-    chan.channel.flushall()
+    # Optionally run all peers on a local channel (no redis needed)
+    local = len(sys.argv) > 3 and sys.argv[3] == 'local'
+
+    if not local:
+        # Flush communication channel
+        lab_channel.flushall()
 
     # we need to spawn processes for support of windows
     mp.set_start_method('spawn')
 
+    # create shared state of the local channel
+    hub = lab_local_channel.LocalHub(n, n_bits=m) if local else None
+
     # create barriers to synchonize bootstrapping
     bar1 = mp.Barrier(n)  # Wait for channel population to complete
     bar2 = mp.Barrier(n)  # Wait for process-group init to complete
@@ -69,7 +80,7 @@ if __name__ == "__main__":  # if script is started from command line
         peer_proc = mp.Process(
             target=create_and_run,
             name=peer_name,
-            args=(m, peer_name, peer_type, Process, bar1, bar2))
+            args=(m, peer_name, peer_type, Process, bar1, bar2, hub))
         children.append((peer_proc, peer_type))
         logger.info("Starting process {} of type {}.".format(
             peer_proc.name, peer_type))
@@ -5,29 +5,35 @@ Application performing a distributed commit
   activities or non at all
 - participants and coordinator run in separate processes
 - multiprocessing works on unix and windows
+- usage: 2pc.py [local], 'local' runs without redis (see lab_local_channel)
 """
 
 import multiprocessing as mp
 import logging
+import sys
 
 import coordinator
 import participant
-from context import lab_channel, lab_logging
+from context import lab_channel, lab_local_channel, lab_logging
 
 lab_logging.setup(stream_level=logging.INFO, file_level=logging.DEBUG)
 
 logger = logging.getLogger("vs2lab.lab6.2pc.2pc")
 
 
-def create_and_run(num_bits, proc_class, enter_bar, run_bar):
+def create_and_run(num_bits, proc_class, enter_bar, run_bar, hub=None):
     """
     Create and run a participant
     :param num_bits: address range of the channel
     :param node_class: class of participant
     :param enter_bar: barrier syncing channel population
     :param run_bar: barrier syncing bootstrap
+    :param hub: shared state of a local channel (None for the redis channel)
     """
-    chan = lab_channel.Channel(n_bits=num_bits)
+    if hub is None:
+        chan = lab_channel.Channel(n_bits=num_bits)
+    else:
+        chan = lab_local_channel.LocalChannel(hub)
     proc = proc_class(chan)
     enter_bar.wait()  # wait for all participants to join the channel
     proc.init()  # do some bootstrapping
@@ -39,13 +45,19 @@ if __name__ == "__main__":  # if script is started from command line
     m = 8  # Number of bits for process ids
     n = 3  # Number of participants in the group
 
-    # Flush communication channel
-    chan = lab_channel.Channel()
-    chan.channel.flushall()
+    # Optionally run all processes on a local channel (no redis needed)
+    local = 'local' in sys.argv[1:]
+
+    if not local:
+        # Flush communication channel
+        lab_channel.flushall()
 
     # we need to spawn processes for support of windows
     mp.set_start_method('spawn')
 
+    # create shared state of the local channel
+    hub = lab_local_channel.LocalHub(n+1, n_bits=m) if local else None
+
     # create barriers to synchonize bootstrapping
     bar1 = mp.Barrier(n+1)  # Wait for channel population to complete
     bar2 = mp.Barrier(n+1)  # Wait for process-group init to complete
@@ -56,7 +68,7 @@ if __name__ == "__main__":  # if script is started from command line
         participant_proc = mp.Process(
             target=create_and_run,
             name="Participant-" + str(i),
-            args=(m, participant.Participant, bar1, bar2))
+            args=(m, participant.Participant, bar1, bar2, hub))
         participants.append(participant_proc)
         participant_proc.start()
 
@@ -64,7 +76,7 @@ if __name__ == "__main__":  # if script is started from command line
     coordinator_proc = mp.Process(
         target=create_and_run,
         name="Coordinator",
-        args=(m, coordinator.Coordinator, bar1, bar2))
+        args=(m, coordinator.Coordinator, bar1, bar2, hub))
     coordinator_proc.start()
 
     # wait for coordinator to finish
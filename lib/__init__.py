@@ -1 +1 @@
-__all__ = ['lab_channel.py', 'lab_logging.py']
+__all__ = ['lab_channel.py', 'lab_local_channel.py', 'lab_logging.py', 'lab_stats.py']
@@ -1,9 +1,350 @@
 import logging
+import marshal
+import math
 import os
 import pickle
 import random
+import struct
+import threading
+import time
+import weakref
 
-import redis
+try:
+    import redis
+    import redis.asyncio
+except ImportError:  # redis is only required by the redis based channels (see lab_local_channel)
+    redis = None
+
+
+class PickleCodec:
+    """
+    Message codec based on pickle (highest protocol). Handles any serializable object.
+    Decoding accepts frames of all codecs in this module (see CompactCodec) and timestamped frames (see stamp).
+    """
+
+    # tag byte of compact (marshal) frames, pickle frames start with the pickle PROTO opcode (0x80)
+    COMPACT_TAG = b'\x01'
+    # tag byte of timestamped frames (followed by the sending time and the actual frame)
+    STAMP_TAG = b'\x02'
+    _STAMP = struct.Struct('>cd')
+
+    def dumps(self, message: object) -> bytes:
+        """
+        Serialize a message.
+        :param message: the message object
+        :return: encoded message frame
+        """
+        return pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, frame: bytes) -> object:
+        """
+        Deserialize a message.
+        :param frame: encoded message frame
+        :return: the message object
+        """
+        if frame[:1] == self.STAMP_TAG:
+            frame = memoryview(frame)[self._STAMP.size:]
+        if frame[:1] == self.COMPACT_TAG:
+            return marshal.loads(memoryview(frame)[1:])
+        return pickle.loads(frame)
+
+    @classmethod
+    def stamp(cls, frame: bytes) -> bytes:
+        """
+        Prefix a frame with the current (wall clock) time, e.g. to measure enqueue-to-dequeue latency.
+        :param frame: encoded message frame
+        :return: timestamped frame
+        """
+        return cls._STAMP.pack(cls.STAMP_TAG, time.time()) + frame
+
+    @classmethod
+    def unstamp(cls, frame: bytes) -> tuple:
+        """
+        Split a frame into sending time and actual frame.
+        :param frame: encoded (and possibly timestamped) message frame
+        :return: tuple of sending time (None if the frame has no timestamp) and frame
+        """
+        if frame[:1] != cls.STAMP_TAG:
+            return None, frame
+        return cls._STAMP.unpack_from(frame)[1], memoryview(frame)[cls._STAMP.size:]
+
+
+class CompactCodec(PickleCodec):
+    """
+    Message codec with a compact binary framing for messages built from built-in primitives,
+    e.g. tuples like (clock, pid, ENTER) or plain strings as used by the lab protocols.
+    Such messages are encoded with marshal, which is smaller and faster than pickle.
+    Any other message (e.g. instances of custom classes) falls back to pickle.
+
+    Compact frames start with a tag byte (COMPACT_TAG) followed by the marshal data.
+    """
+
+    def dumps(self, message: object) -> bytes:
+        try:
+            return self.COMPACT_TAG + marshal.dumps(message, 4)
+        except ValueError:
+            # not a built-in primitive (or container of primitives)
+            return super().dumps(message)
+
+
+class Histogram:
+    """
+    Histogram of non-negative values (e.g. durations in seconds) with power of two bucket bounds.
+    Percentiles are approximated by the upper bound of their bucket.
+    """
+
+    # bucket exponent for zero values
+    ZERO = -64
+
+    def __init__(self):
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+        # bucket exponent e counts values in [2^(e-1), 2^e)
+        self.buckets = {}
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        exponent: int = math.frexp(value)[1] if value > 0 else self.ZERO
+        self.buckets[exponent] = self.buckets.get(exponent, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        """
+        Approximate a percentile.
+        :param p: percentile (0-100)
+        :return: upper bound of the bucket containing the percentile
+        """
+        rank: float = p / 100 * self.count
+        seen: int = 0
+        for exponent in sorted(self.buckets):
+            seen += self.buckets[exponent]
+            if seen >= rank:
+                return min(math.ldexp(1, exponent), self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max,
+            'buckets': {math.ldexp(1, exponent): n for exponent, n in sorted(self.buckets.items())},
+        }
+
+
+class ChannelStats:
+    """
+    Traffic statistics of a channel instance:
+    messages and bytes sent to and received from each peer,
+    enqueue-to-dequeue latency (from the sending time stamped into message frames, see PickleCodec.stamp),
+    time spent blocking in receive operations and time spent encoding and decoding messages.
+
+    Latencies compare wall clocks of sender and receiver, they are only meaningful on a single host
+    (or with synchronized clocks). Messages from uninstrumented senders carry no timestamp.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.started: float = time.time()
+        # peer -> [messages, bytes]
+        self.sent = {}
+        self.received = {}
+        self.latency = Histogram()
+        self.wait = Histogram()
+        self.encoding = Histogram()
+        self.decoding = Histogram()
+
+    def record_send(self, destinations, size: int, encoding_time: float) -> None:
+        with self.__lock:
+            self.encoding.add(encoding_time)
+            for destination in destinations:
+                counters = self.sent.setdefault(destination, [0, 0])
+                counters[0] += 1
+                counters[1] += size
+
+    def record_wait(self, wait_time: float) -> None:
+        with self.__lock:
+            self.wait.add(wait_time)
+
+    def record_receive(self, sender: str, size: int, decoding_time: float, latency: float) -> None:
+        with self.__lock:
+            self.decoding.add(decoding_time)
+            if latency is not None:
+                self.latency.add(max(latency, 0.0))
+            counters = self.received.setdefault(sender, [0, 0])
+            counters[0] += 1
+            counters[1] += size
+
+    @staticmethod
+    def __totals(counters: dict, peers) -> dict:
+        return {'messages': sum(counters[peer][0] for peer in peers if peer in counters),
+                'bytes': sum(counters[peer][1] for peer in peers if peer in counters)}
+
+    def snapshot(self, subgroups: dict = None) -> dict:
+        """
+        Export the current statistics.
+        :param subgroups: optional mapping of subgroup names to member sets to aggregate peers by
+        :return: dict of counters and histogram summaries
+        """
+        with self.__lock:
+            result = {
+                'uptime': time.time() - self.started,
+                'sent': {peer: {'messages': m, 'bytes': b} for peer, (m, b) in self.sent.items()},
+                'received': {peer: {'messages': m, 'bytes': b} for peer, (m, b) in self.received.items()},
+                'latency': self.latency.snapshot(),
+                'wait': self.wait.snapshot(),
+                'encoding': self.encoding.snapshot(),
+                'decoding': self.decoding.snapshot(),
+            }
+            if subgroups:
+                result['subgroups'] = {name: {'sent': self.__totals(self.sent, members),
+                                              'received': self.__totals(self.received, members)}
+                                       for name, members in subgroups.items()}
+        return result
+
+
+# queue key layout: prefix, sender id, receiver id
+_QUEUE_KEY = struct.Struct('>cII')
+
+
+def _queue_key(sender: str, receiver: str) -> bytes:
+    """
+    Construct queue name from sender and receiver ids.
+    :param sender: member identifier
+    :param receiver: member identifier
+    :return: redis key
+    """
+    return _QUEUE_KEY.pack(b'q', int(sender), int(receiver))
+
+
+def _queue_sender(key: bytes) -> str:
+    """
+    Extract the sender id from a queue name.
+    :param key: redis key
+    :return: member identifier
+    """
+    return str(_QUEUE_KEY.unpack(key)[1])
+
+
+# maximum number of redis connections per process and server
+# (blocking receives hold a connection each, one more is held by the member change listener)
+MAX_CONNECTIONS = 64
+
+# connection pools shared by all channels of this process, by server address
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def connection_pool(host_ip: str = 'localhost', port_no: int = 6379, unix_socket_path: str = None):
+    """
+    Retrieve the shared connection pool of this process for a redis server.
+    The pool is bounded (see MAX_CONNECTIONS), callers wait for a free connection if it is exhausted.
+    Connections have no socket timeout, as receive operations might block forever.
+    redis-py pools reset themselves in forked child processes.
+    :param host_ip: redis server host (ignored for unix domain sockets)
+    :param port_no: redis server port (ignored for unix domain sockets)
+    :param unix_socket_path: optional path of a unix domain socket to connect to a local redis server
+    :return: redis connection pool
+    """
+    address = (unix_socket_path,) if unix_socket_path is not None else (host_ip, port_no)
+    with _pools_lock:
+        pool = _pools.get(address)
+        if pool is None:
+            if unix_socket_path is not None:
+                pool = redis.BlockingConnectionPool(max_connections=MAX_CONNECTIONS,
+                                                    connection_class=redis.UnixDomainSocketConnection,
+                                                    path=unix_socket_path, db=0, socket_timeout=None)
+            else:
+                pool = redis.BlockingConnectionPool(max_connections=MAX_CONNECTIONS, host=host_ip, port=port_no, db=0,
+                                                    socket_timeout=None)
+            _pools[address] = pool
+        return pool
+
+
+def flushall(host_ip: str = 'localhost', port_no: int = 6379, unix_socket_path: str = None) -> None:
+    """
+    Remove all channel data (and any other keys) from a redis server.
+    :param host_ip: redis server host
+    :param port_no: redis server port
+    :param unix_socket_path: optional path of a unix domain socket
+    :return: None
+    """
+    assert redis is not None, 'redis package not installed'
+    redis.StrictRedis(connection_pool=connection_pool(host_ip, port_no, unix_socket_path)).flushall()
+
+
+class _MemberListener:
+    """
+    Listener for member change notifications, shared by all channels of a process on a connection pool.
+    A single pub/sub thread (holding one pool connection) calls back all registered channels.
+    Channels are referenced weakly, the listener stops when the last channel is closed.
+    """
+
+    def __init__(self, client, topic: str):
+        self.pid: int = os.getpid()
+        self.callbacks = {}
+        self.lock = threading.Lock()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{topic: self.__notify})
+        self.thread = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def __notify(self, message) -> None:
+        with self.lock:
+            callbacks = list(self.callbacks.items())
+        for key, callback in callbacks:
+            method = callback()
+            if method is not None:
+                method(message)
+            else:
+                self.remove(key)  # channel was garbage collected without close
+
+    def add(self, key: int, method) -> None:
+        with self.lock:
+            self.callbacks[key] = weakref.WeakMethod(method)
+
+    def remove(self, key: int) -> bool:
+        """ Unregister a channel, returns True if no channel is left """
+        with self.lock:
+            self.callbacks.pop(key, None)
+            return not self.callbacks
+
+
+# member change listeners of this process, by connection pool
+_listeners = {}
+
+
+def _listen_members(client, topic: str, key: int, method) -> None:
+    """
+    Register a callback for member change notifications with the shared listener of the client's pool.
+    :param client: redis client
+    :param topic: notification topic
+    :param key: identifier of the registering channel
+    :param method: bound method called with every notification
+    :return: None
+    """
+    with _pools_lock:
+        listener = _listeners.get(client.connection_pool)
+        if listener is None or listener.pid != os.getpid():  # threads do not survive a fork
+            listener = _listeners[client.connection_pool] = _MemberListener(client, topic)
+        listener.add(key, method)
+
+
+def _unlisten_members(client, key: int) -> None:
+    """
+    Unregister a channel from the shared listener, the listener stops with its last channel.
+    :param client: redis client
+    :param key: identifier of the registered channel
+    :return: None
+    """
+    with _pools_lock:
+        listener = _listeners.get(client.connection_pool)
+        if listener is not None and listener.pid == os.getpid() and listener.remove(key):
+            listener.thread.stop()  # the thread returns its connection to the pool
+            del _listeners[client.connection_pool]
 
 
 class Channel:
@@ -22,28 +363,146 @@ class Channel:
     Receive operations of a caller pop messages from respective sender-caller queues for a set of senders.
 
     Queues are implemented as redis lists.
-    The key is a string representation of a list containing sender and receiver ids.
+    The key is a binary string containing a prefix and the sender and receiver ids as 4 byte integers.
     That is, sender and receiver can always be identified by parsing the queue keys.
+    Queue keys are not registered anywhere, the set of all possible queues is derived from the member set.
 
     Redis data Structures:
 
     Global Member Set
         Key: "members"
         Value: redis set of member ID strings
+    Member Change Notifications
+        Topic: "members-changed" (redis pub/sub)
+        Value: member ID that joined or left
     Subgroup Member Sets
         Key: <subgroup>
         Value: redis set of member ID strings
-    Global Queue List (containing all possible queue keys)
-        Key: "xchan"
-        Value: redis list of queue identifier objects
     Queues
-        Key: "['<member1>','<member2>']"
-        Value: redis list of message objects send fom member1 to member2
+        Key: b"q<member1><member2>"
+        Value: redis list of message frames send fom member1 to member2
+
+    Messages are serialized by a pluggable codec (see CompactCodec and PickleCodec).
+
+    Instrumented channels (stats=True) count messages and bytes per peer and measure latencies
+    (see ChannelStats and statistics). Their messages carry the sending time.
+
+    All channel instances of a process share a bounded connection pool per redis server (see connection_pool).
+
+    Each channel instance caches the global member set locally. The cache is dropped whenever a member
+    joins or leaves (as announced on the notification topic) and refreshed before reporting an unknown member.
+    All channels of a process share one listener for these notifications, close releases a channel from it.
+    """
+
+    # pub/sub topic announcing changes of the global member set
+    MEMBERS_TOPIC = 'members-changed'
+
+    # number of random member id candidates offered to the join script
+    JOIN_CANDIDATES = 8
+
+    # Member id allocation executed atomically on the redis server.
+    # KEYS[1]: global member set, KEYS[2]: subgroup member set
+    # ARGV[1]: size of the id space, ARGV[2]: notification topic, ARGV[3..]: random candidate ids
+    # Returns the new member id or nil if all ids are taken.
+    JOIN_SCRIPT = """
+        local function claim(pid)
+            redis.call('SADD', KEYS[1], pid)
+            redis.call('SADD', KEYS[2], pid)
+            redis.call('PUBLISH', ARGV[2], pid)
+            return pid
+        end
+        for i = 3, #ARGV do
+            if redis.call('SISMEMBER', KEYS[1], ARGV[i]) == 0 then
+                return claim(ARGV[i])
+            end
+        end
+        local maxproc = tonumber(ARGV[1])
+        if redis.call('SCARD', KEYS[1]) >= maxproc then
+            return false
+        end
+        local start = tonumber(ARGV[3])
+        for i = 0, maxproc - 1 do
+            local pid = tostring((start + i) % maxproc)
+            if redis.call('SISMEMBER', KEYS[1], pid) == 0 then
+                return claim(pid)
+            end
+        end
+        return false
+    """
+
+    # Multicast send executed atomically on the redis server (one round trip for any fan-out).
+    # KEYS[1]: global member set, KEYS[2..]: destination queues
+    # ARGV[1]: message, ARGV[2]: caller, ARGV[3..]: destinations (in the same order as the queues)
+    # Returns the number of queues written, -1 for an unknown sender or -2 for an unknown receiver.
+    SEND_SCRIPT = """
+        if redis.call('SISMEMBER', KEYS[1], ARGV[2]) == 0 then
+            return -1
+        end
+        for i = 3, #ARGV do
+            if redis.call('SISMEMBER', KEYS[1], ARGV[i]) == 0 then
+                return -2
+            end
+        end
+        for i = 2, #KEYS do
+            redis.call('RPUSH', KEYS[i], ARGV[1])
+        end
+        return #KEYS - 1
     """
 
-    def __init__(self, n_bits: int = 5, host_ip: str = 'localhost', port_no: int = 6379):
-        # create redis client
-        self.channel = redis.StrictRedis(host=host_ip, port=port_no, db=0)
+    # Broadcast send executed atomically on the redis server.
+    # Queue keys are derived from the member set on the server (same format as _queue_key).
+    # KEYS[1]: global member set
+    # ARGV[1]: message, ARGV[2]: caller
+    # Returns the number of queues written or -1 for an unknown sender.
+    SEND_ALL_SCRIPT = """
+        if redis.call('SISMEMBER', KEYS[1], ARGV[2]) == 0 then
+            return -1
+        end
+        local function id(pid)
+            local n = tonumber(pid)
+            return string.char(math.floor(n / 16777216) % 256, math.floor(n / 65536) % 256,
+                               math.floor(n / 256) % 256, n % 256)
+        end
+        local sender = 'q' .. id(ARGV[2])
+        local members = redis.call('SMEMBERS', KEYS[1])
+        for _, member in ipairs(members) do
+            redis.call('RPUSH', sender .. id(member), ARGV[1])
+        end
+        return #members
+    """
+
+    # Drain pending messages from a list of queues in a single round trip.
+    # KEYS: queues in drain order
+    # ARGV[1]: maximum number of messages
+    # Returns a flat list of queue keys and messages (key1, message1, key2, message2, ...).
+    DRAIN_SCRIPT = """
+        local remaining = tonumber(ARGV[1])
+        local result = {}
+        for i = 1, #KEYS do
+            while remaining > 0 do
+                local message = redis.call('LPOP', KEYS[i])
+                if not message then
+                    break
+                end
+                result[#result + 1] = KEYS[i]
+                result[#result + 1] = message
+                remaining = remaining - 1
+            end
+        end
+        return result
+    """
+
+    def __init__(self, n_bits: int = 5, host_ip: str = 'localhost', port_no: int = 6379, codec: PickleCodec = None,
+                 unix_socket_path: str = None, stats: bool = False):
+        # member ids need to fit into the queue keys
+        assert n_bits <= 32, 'address range too large'
+        assert redis is not None, 'redis package not installed'
+        # create redis client on the shared connection pool of this process
+        self.channel = redis.StrictRedis(connection_pool=connection_pool(host_ip, port_no, unix_socket_path))
+        # message serialization
+        self.codec: PickleCodec = codec if codec is not None else CompactCodec()
+        # traffic statistics (None if not instrumented)
+        self.stats: ChannelStats = ChannelStats() if stats else None
         # create dict of local pid bindings
         self.os_members = {}
         # Number of bits for pid addresses
@@ -52,12 +511,64 @@ class Channel:
         self.MAXPROC: int = pow(2, n_bits)
         # create instance logger
         self.logger = logging.getLogger('vs2lab.channel.Channel')
+        # register server-side join and send operations (loaded lazily via EVALSHA)
+        self.__join_script = self.channel.register_script(self.JOIN_SCRIPT)
+        self.__send_script = self.channel.register_script(self.SEND_SCRIPT)
+        self.__send_all_script = self.channel.register_script(self.SEND_ALL_SCRIPT)
+        self.__drain_script = self.channel.register_script(self.DRAIN_SCRIPT)
+        # local view of the global member set (None if invalid) and queues derived from it
+        self.__members = None
+        self.__in_queues = {}
+        # incremented on every change notification to detect refreshes racing with a change
+        self.__generation: int = 0
+        # process in which this channel is registered with the shared member change listener
+        self.__listener_pid = None
         self.logger.debug('New Channel created.')
 
     @staticmethod
     def __decode_set(raw) -> set:
         return {i.decode() for i in raw}
 
+    def __invalidate(self, message=None) -> None:
+        """
+        Drop the cached member view (called by the listener thread on member changes).
+        :param message: pub/sub notification (unused)
+        :return: None
+        """
+        self.__generation += 1
+        self.__members = None
+        self.__in_queues = {}
+
+    def __cached_members(self, refresh: bool = False) -> set:
+        """
+        Retrieve the global member set from the local cache, loading it from redis if needed.
+        :param refresh: force reloading the member set from redis
+        :return: set of member identifiers
+        """
+        # register with the change listener of this process (threads do not survive a fork)
+        if self.__listener_pid != os.getpid():
+            _listen_members(self.channel, self.MEMBERS_TOPIC, id(self), self.__invalidate)
+            self.__listener_pid = os.getpid()
+            refresh = True
+
+        members = self.__members
+        if members is None or refresh:
+            generation: int = self.__generation
+            members = self.__decode_set(self.channel.smembers('members'))
+            # only keep the result if no change was announced in the meantime
+            if generation == self.__generation:
+                self.__members = members
+                self.__in_queues = {}
+        return members
+
+    def __is_member(self, pid: str) -> bool:
+        """
+        Check membership against the local cache, refreshing it once for unknown ids.
+        :param pid: member identifier
+        :return: boolean value, true if pid is a member
+        """
+        return pid in self.__cached_members() or pid in self.__cached_members(refresh=True)
+
     def join(self, subgroup: str) -> str:
         """
         Join a process as a member to the global channel and associate it with a (sub)group. 
@@ -66,45 +577,14 @@ class Channel:
         :param subgroup: an identifier for the grouping
         :return: global member id of the process.
         """
-        # For concurrently assigning unique member ids, we need to use a transaction
-        # atomically reading and writing the member set. This can be implemented by
-        # means of the pipeline construct.
-        with self.channel.pipeline() as pipe:
-            while 1:
-                try:
-                    # Put a WATCH on the key that holds the member set
-                    pipe.watch('members')
-                    # After WATCHing, the pipeline is put into immediate execution
-                    # mode until we tell it to start buffering commands again.
-                    # This allows us to get the current value of the global member set
-                    raw_members = pipe.smembers('members')
-                    members = self.__decode_set(raw_members)
-                    # Now construct new/unused random member id
-                    remaining_ids = list(set([str(i) for i in range(self.MAXPROC)]) - members)
-                    new_pid = random.choice(remaining_ids)
-                    # Then we can put the pipeline back into buffered mode with MULTI
-                    pipe.multi()
-                    # Add new member id to global member set and subgroup
-                    pipe.sadd('members', new_pid)
-                    pipe.sadd(subgroup, new_pid)
-                    # and finally, execute the pipeline (the set command)
-                    pipe.execute()
-                    # if a WatchError wasn't raised during execution,
-                    # everything we just did happened atomically.
-                    break
-                except redis.WatchError:
-                    # another client must have changed 'members' between
-                    # the time we started WATCHing it and the pipeline's execution.
-                    # our best bet is to just retry.
-                    continue
+        # Unique member ids are assigned atomically on the redis server. The script claims the
+        # first free candidate out of a few random ids and only scans the id space if all of them
+        # are taken (i.e. the id space is nearly exhausted). No retries are needed on contention.
+        candidates: list = [random.randrange(self.MAXPROC) for _ in range(self.JOIN_CANDIDATES)]
+        raw_pid = self.__join_script(keys=['members', subgroup], args=[self.MAXPROC, self.MEMBERS_TOPIC] + candidates)
+        assert raw_pid is not None, 'no free member id'
+        new_pid: str = raw_pid.decode()
         self.logger.info("Member {} joining {}.".format(new_pid, subgroup))
-
-        # construct bidirectional queue names for new member and all existing members (if any)
-        if len(members) > 0:
-            xchan: list = [[new_pid, other] for other in members] + [[other, new_pid] for other in members]
-            # push queue names to global list of all possible transfer queues
-            for xc in xchan:
-                self.channel.rpush('xchan', pickle.dumps(xc))
         return new_pid
 
     def leave(self, subgroup: str):
@@ -119,23 +599,16 @@ class Channel:
         assert self.channel.sismember('members', pid), 'member unknown'
         self.logger.info("Member {} leaving {}".format(pid, subgroup))
 
-        # remove binding and global member element
+        # remove binding
         del self.os_members[os_pid]
-        self.channel.srem('members', pid)
-
-        # decode member set binary elements to string list
-        raw_members: set = self.channel.smembers('members')
-        members: set = self.__decode_set(raw_members)
-
-        # construct bidirectional queue names for new member and all existing members (if any)
-        if len(members) > 0:
-            xchan: list = [[pid, other] for other in members] + [[other, pid] for other in members]
-            # pop queue names from global list of all possible transfer queues
-            for xc in xchan:
-                self.channel.lrem('xchan', 0, pickle.dumps(xc))
 
-        # remove member id from subgroup set
-        self.channel.srem(subgroup, pid)
+        # remove member id from global member set and subgroup set
+        # and notify all channel instances about the departed member (in a single transaction)
+        with self.channel.pipeline() as pipe:
+            pipe.srem('members', pid)
+            pipe.srem(subgroup, pid)
+            pipe.publish(self.MEMBERS_TOPIC, pid)
+            pipe.execute()
 
     def exists(self, pid: str) -> bool:
         """
@@ -166,15 +639,86 @@ class Channel:
         """
         return self.__decode_set(self.channel.smembers(subgroup))
 
-    @staticmethod
-    def __queue_key(sender: str, receiver: str) -> str:
+    def in_subgroup(self, pid: str, subgroup: str) -> bool:
+        """
+        Check if a member belongs to a subgroup (without retrieving the whole subgroup).
+        :param pid: process identifier
+        :param subgroup: subgroup string identifier
+        :return: boolean value, true if pid is a member of the subgroup
+        """
+        return bool(self.channel.sismember(subgroup, pid))
+
+    def queues(self) -> set:
+        """
+        Derive the keys of all possible transfer queues between current members.
+        :return: set of redis keys
+        """
+        members: set = self.__decode_set(self.channel.smembers('members'))
+        return {_queue_key(sender, receiver) for sender in members for receiver in members}
+
+    def close(self) -> None:
+        """
+        Release this channel instance from the member change listener of the process.
+        The listener and its redis connection stop with the last channel of the process.
+        The channel remains usable, its next member lookup registers it again.
+        :return: None
+        """
+        if self.__listener_pid == os.getpid():
+            _unlisten_members(self.channel, id(self))
+        self.__listener_pid = None
+        self.__invalidate()
+
+    def statistics(self, subgroups=()) -> dict:
         """
-        Construct queue name from sender and receiver ids.
-        :param sender: member identifier
-        :param receiver: member identifier
-        :return: redis key
+        Export the traffic statistics of this channel instance (requires stats=True).
+        :param subgroups: optional subgroup identifiers to aggregate traffic by
+        :return: dict of counters and histogram summaries (see ChannelStats.snapshot)
         """
-        return str([sender, receiver])
+        assert self.stats is not None, 'channel not instrumented'
+        return self.stats.snapshot({name: self.subgroup(name) for name in subgroups})
+
+    def __encode(self, message: object) -> tuple:
+        """
+        Serialize a message (and stamp it if instrumented).
+        :param message: the message object
+        :return: tuple of frame and encoding time (0 if not instrumented)
+        """
+        if self.stats is None:
+            return self.codec.dumps(message), 0.0
+        started: float = time.perf_counter()
+        frame: bytes = self.codec.dumps(message)
+        return self.codec.stamp(frame), time.perf_counter() - started
+
+    def __decode(self, sender: str, frame: bytes) -> object:
+        """
+        Deserialize a message (and record it if instrumented).
+        :param sender: sending member identifier
+        :param frame: encoded message frame
+        :return: the message object
+        """
+        if self.stats is None:
+            return self.codec.loads(frame)
+        received: float = time.time()
+        started: float = time.perf_counter()
+        sent, payload = self.codec.unstamp(frame)
+        message = self.codec.loads(payload)
+        self.stats.record_receive(sender, len(frame), time.perf_counter() - started,
+                                  None if sent is None else received - sent)
+        return message
+
+    def __blpop(self, in_queues, timeout: int):
+        """
+        Block until a message appears on one of the queues (and record the waiting time if instrumented).
+        :param in_queues: redis keys
+        :param timeout: timeout in seconds (0 to block forever)
+        :return: tuple of queue key and frame or None on timeout
+        """
+        if self.stats is None:
+            return self.channel.blpop(in_queues, timeout)
+        started: float = time.perf_counter()
+        result = self.channel.blpop(in_queues, timeout)
+        self.stats.record_wait(time.perf_counter() - started)
+        return result
 
     def send_to(self, destination_set: set, message: object) -> None:
         """
@@ -186,15 +730,20 @@ class Channel:
         # destination_set needs to contain string identifiers
         assert all(type(k) is str for k in destination_set), 'type error'
 
-        # lookup member id by pid and validate it
+        # lookup member id by pid
         caller: str = self.os_members[os.getpid()]
-        assert self.channel.sismember('members', caller), 'unknown sender'
-        self.logger.debug("{} sends {} to {}".format(caller, message, destination_set))
+        self.logger.debug("%s sends %s to %s", caller, message, destination_set)
 
-        # push message to incoming queues of all destinations
-        for destination in destination_set:
-            assert self.channel.sismember('members', destination), 'unknown receiver'
-            self.channel.rpush(self.__queue_key(caller, destination), pickle.dumps(message))
+        # validate sender and receivers and push message to incoming queues of all destinations
+        destinations: list = list(destination_set)
+        frame, encoding_time = self.__encode(message)
+        result: int = self.__send_script(
+            keys=['members'] + [_queue_key(caller, destination) for destination in destinations],
+            args=[frame, caller] + destinations)
+        assert result != -1, 'unknown sender'
+        assert result != -2, 'unknown receiver'
+        if self.stats is not None:
+            self.stats.record_send(destinations, len(frame), encoding_time)
 
     def send_to_all(self, message: object) -> None:
         """
@@ -203,15 +752,31 @@ class Channel:
         :param message: the message object to be send
         :return: None
         """
-        # lookup member id by pid and validate it
+        # lookup member id by pid
         caller: str = self.os_members[os.getpid()]
-        assert self.channel.sismember('members', caller), 'unknown sender'
-        self.logger.debug("{} sends {} to all members".format(caller, message))
+        self.logger.debug("%s sends %s to all members", caller, message)
 
-        members = self.__decode_set(self.channel.smembers('members'))
-        # push message to incoming queues of all members
-        for destination in members:
-            self.channel.rpush([self.__queue_key(caller, destination)], pickle.dumps(message))
+        # validate sender and push message to incoming queues of all members
+        frame, encoding_time = self.__encode(message)
+        result: int = self.__send_all_script(keys=['members'], args=[frame, caller])
+        assert result != -1, 'unknown sender'
+        if self.stats is not None:
+            self.stats.record_send(self.__cached_members(), len(frame), encoding_time)
+
+    def __incoming_queues(self, caller: str) -> list:
+        """
+        Construct the incoming message queues of a member from all members (in order of sender ids).
+        The list is reused until the member set changes.
+        :param caller: receiving member identifier
+        :return: list of redis keys
+        """
+        queue_cache: dict = self.__in_queues
+        in_queues = queue_cache.get(caller)
+        if in_queues is None:
+            members: set = self.__cached_members()
+            in_queues = sorted(_queue_key(member, caller) for member in members)
+            queue_cache[caller] = in_queues
+        return in_queues
 
     def receive_from_any(self, timeout: int = 0) -> tuple:
         """
@@ -221,24 +786,21 @@ class Channel:
         """
         # lookup member id by pid and validate it
         caller = self.os_members[os.getpid()]
-        assert self.channel.sismember('members', str(caller)), 'unknown receiver'
+        assert self.__is_member(str(caller)), 'unknown receiver'
 
-        # decode member set binary elements
-        members: set = self.__decode_set(self.channel.smembers('members'))
         # construct incoming message queues for all members
-        in_queues: set = {self.__queue_key(member, caller) for member in members}
-        self.logger.debug("{} receives from {}".format(caller, in_queues))
+        in_queues: list = self.__incoming_queues(caller)
+        self.logger.debug("%s receives from %s", caller, in_queues)
 
         # block until new msg appears on one of the incoming queues
-        result = self.channel.blpop(in_queues, timeout)
+        result = self.__blpop(in_queues, timeout)
         if result is not None:
             # extract sender id from key part
-            key: str = result[0].decode()
-            sender: str = key.split("'")[1]
+            sender: str = _queue_sender(result[0])
             # deserialize msg content
-            message = pickle.loads(result[1])
+            message = self.__decode(sender, result[1])
             # log and return results
-            self.logger.debug("{} received {} from {}".format(caller, message, sender))
+            self.logger.debug("%s received %s from %s", caller, message, sender)
             return sender, message
 
     def receive_from(self, sender_set: set, timeout: int = 0) -> tuple:
@@ -253,23 +815,252 @@ class Channel:
 
         # lookup member id by pid and validate it
         caller: str = self.os_members[os.getpid()]
-        assert self.channel.sismember('members', caller), 'unknown receiver'
-        self.logger.debug("{} receives from {}".format(caller, sender_set))
+        assert self.__is_member(caller), 'unknown receiver'
+        self.logger.debug("%s receives from %s", caller, sender_set)
 
         # validate all senders and construct incoming queues for them
         in_queues: set = set()
         for sender in sender_set:
-            assert self.channel.sismember('members', sender), 'unknown sender'
-            in_queues.add(self.__queue_key(sender, caller))
+            assert self.__is_member(sender), 'unknown sender'
+            in_queues.add(_queue_key(sender, caller))
 
         # block until new msg appears on one of the queues
-        result = self.channel.blpop(in_queues, timeout)
+        result = self.__blpop(in_queues, timeout)
         if result is not None:
             # extract sender id from key part
-            key: str = result[0].decode()
-            sender: str = key.split("'")[1]
+            sender: str = _queue_sender(result[0])
             # deserialize msg content
-            message = pickle.loads(result[1])
+            message = self.__decode(sender, result[1])
             # log and return results
-            self.logger.debug("{} received {} from {}".format(caller, message, sender))
+            self.logger.debug("%s received %s from %s", caller, message, sender)
             return sender, message
+
+    def receive_batch(self, max_n: int, timeout: int = 0, sender_set: set = None) -> list:
+        """
+        Make a blocking call to take the next message off any of the callers' queues (from the
+        members specified in the sender_set attribute or from all members) and drain up to max_n
+        pending messages from these queues in one more round trip.
+        Messages are ordered by sender id and keep their sending order per sender.
+        :param max_n: maximum number of messages
+        :param timeout: optional timeout for blocking on the first message
+        :param sender_set: optional set of ids to watch respective incoming queues
+        :return: list of tuples containing sender and message (empty on timeout)
+        """
+        # lookup member id by pid and validate it
+        caller: str = self.os_members[os.getpid()]
+        assert self.__is_member(caller), 'unknown receiver'
+
+        # construct incoming queues (in order of sender ids)
+        if sender_set is None:
+            in_queues: list = self.__incoming_queues(caller)
+        else:
+            assert all(self.__is_member(sender) for sender in sender_set), 'unknown sender'
+            in_queues: list = sorted(_queue_key(sender, caller) for sender in sender_set)
+        self.logger.debug("%s receives up to %s from %s", caller, max_n, in_queues)
+
+        # block until new msg appears on one of the queues
+        result = self.__blpop(in_queues, timeout)
+        if result is None:
+            return []
+        raw: list = [result[0], result[1]]
+        # then take all further pending messages at once
+        if max_n > 1:
+            raw += self.__drain_script(keys=in_queues, args=[max_n - 1])
+
+        batch: list = []
+        for i in range(0, len(raw), 2):
+            sender: str = _queue_sender(raw[i])
+            batch.append((sender, self.__decode(sender, raw[i + 1])))
+        # the first message is the oldest of its queue, so a stable sort keeps the order per sender
+        batch.sort(key=lambda entry: int(entry[0]))
+        self.logger.debug("%s received %s messages", caller, len(batch))
+        return batch
+
+
+class AsyncChannel:
+    """
+    AsyncChannel provides the Channel API for asyncio applications.
+    It uses the same redis data structures, server-side scripts and codecs as Channel,
+    thus members of both channel types can communicate with each other.
+
+    Other than Channel, an AsyncChannel instance represents a single member (bound via join or bind)
+    instead of mapping os pids to member ids. Many members can be multiplexed on a single event loop
+    by creating an AsyncChannel instance per member that shares the redis client of another instance.
+    Note that every pending receive operation occupies a redis connection of the shared client.
+
+    Incoming messages can also be consumed by iterating over the channel:
+
+        async for sender, message in channel:
+            ...
+    """
+
+    def __init__(self, n_bits: int = 5, host_ip: str = 'localhost', port_no: int = 6379, codec: PickleCodec = None,
+                 client: 'redis.asyncio.StrictRedis' = None, unix_socket_path: str = None):
+        # member ids need to fit into the queue keys
+        assert n_bits <= 32, 'address range too large'
+        assert redis is not None, 'redis package not installed'
+        # create redis client (or share the client of another instance)
+        if client is not None:
+            self.channel = client
+        elif unix_socket_path is not None:
+            self.channel = redis.asyncio.StrictRedis(unix_socket_path=unix_socket_path, db=0, socket_timeout=None)
+        else:
+            self.channel = redis.asyncio.StrictRedis(host=host_ip, port=port_no, db=0, socket_timeout=None)
+        # message serialization
+        self.codec: PickleCodec = codec if codec is not None else CompactCodec()
+        # member id of this instance
+        self.pid = None
+        # Number of bits for pid addresses
+        self.n_bits: int = n_bits
+        # Maximum corresponding pid
+        self.MAXPROC: int = pow(2, n_bits)
+        # create instance logger
+        self.logger = logging.getLogger('vs2lab.channel.AsyncChannel')
+        # register server-side join and send operations (loaded lazily via EVALSHA)
+        self.__join_script = self.channel.register_script(Channel.JOIN_SCRIPT)
+        self.__send_script = self.channel.register_script(Channel.SEND_SCRIPT)
+        self.__send_all_script = self.channel.register_script(Channel.SEND_ALL_SCRIPT)
+        self.logger.debug('New AsyncChannel created.')
+
+    def member(self):
+        """
+        Create another channel instance for a new member sharing the redis client of this instance.
+        :return: new AsyncChannel instance
+        """
+        return AsyncChannel(n_bits=self.n_bits, codec=self.codec, client=self.channel)
+
+    async def join(self, subgroup: str) -> str:
+        """
+        Join this instance as a member to the global channel and associate it with a (sub)group.
+        The instance is bound to the new member id.
+        :param subgroup: an identifier for the grouping
+        :return: global member id
+        """
+        candidates: list = [random.randrange(self.MAXPROC) for _ in range(Channel.JOIN_CANDIDATES)]
+        raw_pid = await self.__join_script(keys=['members', subgroup],
+                                           args=[self.MAXPROC, Channel.MEMBERS_TOPIC] + candidates)
+        assert raw_pid is not None, 'no free member id'
+        self.pid = raw_pid.decode()
+        self.logger.info("Member {} joining {}.".format(self.pid, subgroup))
+        return self.pid
+
+    async def leave(self, subgroup: str):
+        """
+        Unregister the member of this instance from the global channel (and subgroup).
+        :param subgroup: subgroup identifier
+        :return: None
+        """
+        pid: str = self.pid
+        assert await self.channel.sismember('members', pid), 'member unknown'
+        self.logger.info("Member {} leaving {}".format(pid, subgroup))
+        self.pid = None
+
+        async with self.channel.pipeline() as pipe:
+            pipe.srem('members', pid)
+            pipe.srem(subgroup, pid)
+            pipe.publish(Channel.MEMBERS_TOPIC, pid)
+            await pipe.execute()
+
+    async def exists(self, pid: str) -> bool:
+        """
+        Check if pid is in global member set
+        :param pid: process identifier
+        :return: boolean value, true if pid is a member
+        """
+        return bool(await self.channel.sismember('members', pid))
+
+    def bind(self, pid: str) -> None:
+        """
+        Associate this instance with an existing channel member id.
+        :param pid: identifier of process member
+        :return: None
+        """
+        self.pid = pid
+        self.logger.debug("Member {} bound".format(pid))
+
+    async def subgroup(self, subgroup: str) -> set:
+        """
+        Retrieve members of a subgroup.
+        :param subgroup: subgroup string identifier
+        :return: set of member process identifiers
+        """
+        return {i.decode() for i in await self.channel.smembers(subgroup)}
+
+    async def in_subgroup(self, pid: str, subgroup: str) -> bool:
+        """
+        Check if a member belongs to a subgroup (without retrieving the whole subgroup).
+        :param pid: process identifier
+        :param subgroup: subgroup string identifier
+        :return: boolean value, true if pid is a member of the subgroup
+        """
+        return bool(await self.channel.sismember(subgroup, pid))
+
+    async def send_to(self, destination_set: set, message: object) -> None:
+        """
+        Sends an asynchronous, persistent multicast message.
+        :param destination_set: a set of member identifiers
+        :param message: the message object to be send
+        :return: None
+        """
+        assert all(type(k) is str for k in destination_set), 'type error'
+        self.logger.debug("%s sends %s to %s", self.pid, message, destination_set)
+
+        destinations: list = list(destination_set)
+        result: int = await self.__send_script(
+            keys=['members'] + [_queue_key(self.pid, destination) for destination in destinations],
+            args=[self.codec.dumps(message), self.pid] + destinations)
+        assert result != -1, 'unknown sender'
+        assert result != -2, 'unknown receiver'
+
+    async def send_to_all(self, message: object) -> None:
+        """
+        Sends an asynchronous, persistent broadcast message.
+        :param message: the message object to be send
+        :return: None
+        """
+        self.logger.debug("%s sends %s to all members", self.pid, message)
+
+        result: int = await self.__send_all_script(keys=['members'], args=[self.codec.dumps(message), self.pid])
+        assert result != -1, 'unknown sender'
+
+    async def __receive(self, in_queues: list, timeout: int) -> tuple:
+        # wait until new msg appears on one of the queues
+        result = await self.channel.blpop(in_queues, timeout)
+        if result is not None:
+            sender: str = _queue_sender(result[0])
+            message = self.codec.loads(result[1])
+            self.logger.debug("%s received %s from %s", self.pid, message, sender)
+            return sender, message
+
+    async def receive_from_any(self, timeout: int = 0) -> tuple:
+        """
+        Wait for the next message on any of the members' incoming queues.
+        :param timeout: optional timeout for waiting.
+        :return: tuple containing the sender and message (None on timeout)
+        """
+        members: set = {i.decode() for i in await self.channel.smembers('members')}
+        assert self.pid in members, 'unknown receiver'
+        return await self.__receive([_queue_key(member, self.pid) for member in members], timeout)
+
+    async def receive_from(self, sender_set: set, timeout: int = 0) -> tuple:
+        """
+        Wait for the next message from any of the members specified in the sender_set attribute.
+        :param sender_set: set of ids to watch respective incoming queues for a new message
+        :param timeout: optional timeout for waiting
+        :return: tuple containing the sender and message (None on timeout)
+        """
+        senders: list = list(sender_set)
+        # validate receiver and all senders in a single round trip
+        async with self.channel.pipeline(transaction=False) as pipe:
+            for pid in [self.pid] + senders:
+                pipe.sismember('members', pid)
+            known: list = await pipe.execute()
+        assert known[0], 'unknown receiver'
+        assert all(known[1:]), 'unknown sender'
+        return await self.__receive([_queue_key(sender, self.pid) for sender in senders], timeout)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> tuple:
+        return await self.receive_from_any()
@@ -0,0 +1,318 @@
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+
+
+class _Counter:
+    """ Thread-local replacement for a shared multiprocessing value """
+
+    def __init__(self):
+        self.value = 0
+
+
+class LocalHub:
+    """
+    LocalHub holds the shared state of a group of local channel members on a single host.
+    It replaces the redis server for LocalChannel instances and has to be created upfront
+    by the parent process, which passes it to all member processes (e.g. as process argument).
+
+    The hub provides a fixed number of member slots. Each slot holds a member id, its subgroup
+    and an incoming queue for all messages sent to the member.
+
+    Shared Data Structures:
+
+    Member Slots
+        ids: shared array of member ids (-1 for free slots)
+        subgroups: shared byte array of subgroup names (fixed length per slot)
+    Membership Version
+        version: shared counter incremented on every join/leave
+    Incoming Queues
+        inboxes: list of queues holding (sender, receiver, message) tuples
+    """
+
+    # maximum length of subgroup names (utf-8 encoded)
+    SUBGROUP_LEN = 32
+
+    def __init__(self, size: int, n_bits: int = 5, processes: bool = True):
+        """
+        :param size: maximum number of members
+        :param n_bits: number of bits for member ids
+        :param processes: share hub between processes (True) or threads of a single process (False)
+        """
+        assert size <= pow(2, n_bits), 'address range too small'
+        self.size: int = size
+        self.n_bits: int = n_bits
+        if processes:
+            # members in different processes use shared memory and pipes (messages are pickled)
+            self.lock = multiprocessing.Lock()
+            self.ids = multiprocessing.Array('q', [-1] * size, lock=False)
+            self.subgroups = multiprocessing.Array('c', size * self.SUBGROUP_LEN, lock=False)
+            self.version = multiprocessing.Value('q', 0, lock=False)
+            self.inboxes: list = [multiprocessing.Queue() for _ in range(size)]
+        else:
+            # members in threads of one process exchange message objects without serialization
+            self.lock = threading.Lock()
+            self.ids = [-1] * size
+            self.subgroups = bytearray(size * self.SUBGROUP_LEN)
+            self.version = _Counter()
+            self.inboxes: list = [queue.Queue() for _ in range(size)]
+
+    def subgroup_of(self, slot: int) -> str:
+        """
+        Read the subgroup name of a slot.
+        :param slot: slot index
+        :return: subgroup name
+        """
+        raw = self.subgroups[slot * self.SUBGROUP_LEN:(slot + 1) * self.SUBGROUP_LEN]
+        return bytes(raw).rstrip(b'\x00').decode()
+
+
+class LocalChannel:
+    """
+    LocalChannel implements the Channel interface for groups of members on a single host
+    without a redis server. Members might run in separate processes (e.g. multiprocessing children)
+    or threads, depending on the LocalHub they share.
+
+    Every member has a single incoming queue in the hub. Messages are tagged with sender and receiver.
+    Receive operations for a subset of senders keep messages from other senders in a local
+    pending list (in arrival order) until they are requested.
+
+    Member ids are cached locally along with their slots and refreshed whenever the membership
+    version of the hub changes (a shared memory read, no communication).
+    """
+
+    def __init__(self, hub: LocalHub):
+        self.hub: LocalHub = hub
+        # create dict of local pid bindings
+        self.os_members = {}
+        # Number of bits for pid addresses
+        self.n_bits: int = hub.n_bits
+        # Maximum corresponding pid
+        self.MAXPROC: int = pow(2, hub.n_bits)
+        # cached mapping of member ids to slots and the membership version it reflects
+        self.__slots = {}
+        self.__version = -1
+        # received messages waiting for a matching receive call
+        self.__pending = {}
+        # create instance logger
+        self.logger = logging.getLogger('vs2lab.channel.LocalChannel')
+        self.logger.debug('New LocalChannel created.')
+
+    def __members(self) -> dict:
+        """
+        Retrieve the (cached) mapping of member ids to slots.
+        :return: dict of member id strings to slot indexes
+        """
+        if self.__version != self.hub.version.value:
+            with self.hub.lock:
+                self.__version = self.hub.version.value
+                self.__slots = {str(pid): slot for slot, pid in enumerate(self.hub.ids) if pid >= 0}
+        return self.__slots
+
+    def join(self, subgroup: str) -> str:
+        """
+        Join a process as a member to the global channel and associate it with a (sub)group.
+        :param subgroup: an identifier for the grouping
+        :return: global member id of the process.
+        """
+        raw_subgroup: bytes = subgroup.encode()
+        assert len(raw_subgroup) <= LocalHub.SUBGROUP_LEN, 'subgroup name too long'
+        with self.hub.lock:
+            ids: list = list(self.hub.ids)
+            assert -1 in ids, 'no free member slot'
+            slot: int = ids.index(-1)
+            new_pid: int = random.randrange(self.MAXPROC)
+            while new_pid in ids:
+                new_pid = random.randrange(self.MAXPROC)
+            self.hub.ids[slot] = new_pid
+            offset: int = slot * LocalHub.SUBGROUP_LEN
+            self.hub.subgroups[offset:offset + LocalHub.SUBGROUP_LEN] = raw_subgroup.ljust(LocalHub.SUBGROUP_LEN,
+                                                                                         b'\x00')
+            self.hub.version.value += 1
+        self.logger.info("Member {} joining {}.".format(new_pid, subgroup))
+        return str(new_pid)
+
+    def leave(self, subgroup: str):
+        """
+        Unregister a process from the global channel (and subgroup).
+        :param subgroup: subgroup identifier
+        :return: None
+        """
+        os_pid: int = os.getpid()
+        pid: str = self.os_members[os_pid]
+        self.logger.info("Member {} leaving {}".format(pid, subgroup))
+        with self.hub.lock:
+            ids: list = list(self.hub.ids)
+            assert int(pid) in ids, 'member unknown'
+            self.hub.ids[ids.index(int(pid))] = -1
+            self.hub.version.value += 1
+        del self.os_members[os_pid]
+        self.__pending.pop(pid, None)
+
+    def exists(self, pid: str) -> bool:
+        """
+        Check if pid is in global member set
+        :param pid: process identifier
+        :return: boolean value, true if pid is a member
+        """
+        return str(pid) in self.__members()
+
+    def bind(self, pid: str) -> int:
+        """
+        Associate os pid with channel member id.
+        :param pid: identifier of process member
+        :return: os pid value
+        """
+        os_pid: int = os.getpid()
+        self.os_members[os_pid] = pid
+        self.logger.debug("Member {} bound {}".format(pid, os_pid))
+        return os_pid
+
+    def subgroup(self, subgroup: str) -> set:
+        """
+        Retrieve members of a subgroup.
+        :param subgroup: subgroup string identifier
+        :return: set of member process identifiers
+        """
+        return {pid for pid, slot in self.__members().items() if self.hub.subgroup_of(slot) == subgroup}
+
+    def in_subgroup(self, pid: str, subgroup: str) -> bool:
+        """
+        Check if a member belongs to a subgroup (without scanning the whole subgroup).
+        :param pid: process identifier
+        :param subgroup: subgroup string identifier
+        :return: boolean value, true if pid is a member of the subgroup
+        """
+        slot = self.__members().get(str(pid))
+        return slot is not None and self.hub.subgroup_of(slot) == subgroup
+
+    def send_to(self, destination_set: set, message: object) -> None:
+        """
+        Sends an asynchronous multicast message.
+        :param destination_set: a set of member identifiers
+        :param message: the message object to be send
+        :return: None
+        """
+        assert all(type(k) is str for k in destination_set), 'type error'
+
+        caller: str = self.os_members[os.getpid()]
+        members: dict = self.__members()
+        assert caller in members, 'unknown sender'
+        self.logger.debug("%s sends %s to %s", caller, message, destination_set)
+
+        # validate all receivers before delivering to any of them
+        assert all(destination in members for destination in destination_set), 'unknown receiver'
+        for destination in destination_set:
+            self.hub.inboxes[members[destination]].put((caller, destination, message))
+
+    def send_to_all(self, message: object) -> None:
+        """
+        Sends an asynchronous broadcast message to all currently registered members.
+        :param message: the message object to be send
+        :return: None
+        """
+        caller: str = self.os_members[os.getpid()]
+        members: dict = self.__members()
+        assert caller in members, 'unknown sender'
+        self.logger.debug("%s sends %s to all members", caller, message)
+
+        for destination, slot in members.items():
+            self.hub.inboxes[slot].put((caller, destination, message))
+
+    def __receive(self, caller: str, sender_set, timeout: int) -> tuple:
+        """
+        Take the next message for the caller from the pending list or the incoming queue.
+        :param caller: receiving member id
+        :param sender_set: set of accepted senders (None for any sender)
+        :param timeout: timeout in seconds (0 to block forever, None to not block at all)
+        :return: tuple of sender and message or None on timeout
+        """
+        pending: list = self.__pending.setdefault(caller, [])
+        for i, (sender, message) in enumerate(pending):
+            if sender_set is None or sender in sender_set:
+                del pending[i]
+                return sender, message
+
+        inbox = self.hub.inboxes[self.__members()[caller]]
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            try:
+                if timeout is None:
+                    sender, receiver, message = inbox.get_nowait()
+                else:
+                    remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                    sender, receiver, message = inbox.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if receiver != caller:
+                continue  # left over for a former member of this slot
+            if sender_set is None or sender in sender_set:
+                return sender, message
+            pending.append((sender, message))
+
+    def receive_from_any(self, timeout: int = 0) -> tuple:
+        """
+        Make a blocking request to take the next message off the callers' incoming queue.
+        :param timeout: optional timeout for blocking read.
+        :return: tuple containing the sender and message
+        """
+        caller: str = self.os_members[os.getpid()]
+        assert caller in self.__members(), 'unknown receiver'
+        self.logger.debug("%s receives from any", caller)
+
+        result = self.__receive(caller, None, timeout)
+        if result is not None:
+            self.logger.debug("%s received %s from %s", caller, result[1], result[0])
+            return result
+
+    def receive_from(self, sender_set: set, timeout: int = 0) -> tuple:
+        """
+        Make a blocking call to take the next message from any of the members specified in the sender_set attribute.
+        :param sender_set: set of ids to accept a new message from
+        :param timeout: optional timeout for blocking call
+        :return: tuple containing the sender and message
+        """
+        caller: str = self.os_members[os.getpid()]
+        members: dict = self.__members()
+        assert caller in members, 'unknown receiver'
+        assert all(sender in members for sender in sender_set), 'unknown sender'
+        self.logger.debug("%s receives from %s", caller, sender_set)
+
+        result = self.__receive(caller, set(sender_set), timeout)
+        if result is not None:
+            self.logger.debug("%s received %s from %s", caller, result[1], result[0])
+            return result
+
+    def receive_batch(self, max_n: int, timeout: int = 0, sender_set: set = None) -> list:
+        """
+        Make a blocking call to take the next message (from the members specified in the sender_set
+        attribute or from any member) and then take up to max_n messages that are already pending.
+        Messages are ordered by sender id and keep their sending order per sender.
+        :param max_n: maximum number of messages
+        :param timeout: optional timeout for blocking on the first message
+        :param sender_set: optional set of ids to accept messages from
+        :return: list of tuples containing sender and message (empty on timeout)
+        """
+        caller: str = self.os_members[os.getpid()]
+        members: dict = self.__members()
+        assert caller in members, 'unknown receiver'
+        if sender_set is not None:
+            sender_set = set(sender_set)
+            assert all(sender in members for sender in sender_set), 'unknown sender'
+        self.logger.debug("%s receives up to %s from %s", caller, max_n, sender_set)
+
+        batch: list = []
+        result = self.__receive(caller, sender_set, timeout)
+        while result is not None:
+            batch.append(result)
+            if len(batch) >= max_n:
+                break
+            result = self.__receive(caller, sender_set, None)
+
+        batch.sort(key=lambda entry: int(entry[0]))
+        self.logger.debug("%s received %s messages", caller, len(batch))
+        return batch
@@ -1,7 +1,46 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import threading
 
 
-def setup(stream_level=logging.WARNING, file_level=logging.DEBUG, file_postfix=''):
+class _QueueHandler(logging.handlers.QueueHandler):
+    # hands records to the listener thread as they are, message formatting happens in the listener
+    # (arguments of log calls must not be modified after the call)
+
+    def prepare(self, record):
+        return record
+
+
+class _BatchHandler(logging.handlers.MemoryHandler):
+    # buffers records for its target stream handler and writes them with a single write and flush
+    # when the buffer is full, a record is severe or the listener has no further records queued
+    # (i.e. no delay if idle)
+
+    def __init__(self, capacity, target, records):
+        super().__init__(capacity, flushLevel=logging.WARNING, target=target)
+        self.records = records
+
+    def shouldFlush(self, record):
+        return super().shouldFlush(record) or self.records.empty()
+
+    def flush(self):
+        with self.lock:
+            if not self.buffer or self.target is None:
+                return
+            target = self.target
+            text = ''.join(target.format(record) + target.terminator for record in self.buffer)
+            with target.lock:
+                try:
+                    target.stream.write(text)
+                    target.stream.flush()
+                except Exception:
+                    target.handleError(self.buffer[-1])
+            self.buffer.clear()
+
+
+def setup(stream_level=logging.WARNING, file_level=logging.DEBUG, file_postfix='', queued=False, batch_size=256):
     # create logger with 'vs2lab'
     logger = logging.getLogger('vs2lab')
     logger.setLevel(logging.DEBUG)
@@ -20,6 +59,41 @@ def setup(stream_level=logging.WARNING, file_level=logging.DEBUG, file_postfix='
     fh.setFormatter(formatter)
     ch.setFormatter(formatter)
 
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    if not queued:
+        # add the handlers to the logger
+        logger.addHandler(fh)
+        logger.addHandler(ch)
+        return
+
+    # queued mode: log calls only enqueue records, a listener thread formats and writes them
+    # (file writes are batched), so logging does not block the calling threads
+    records = queue.SimpleQueue()
+    bh = _BatchHandler(batch_size, fh, records)
+    bh.setLevel(file_level)
+    listener = logging.handlers.QueueListener(records, bh, ch, respect_handler_level=True)
+    qh = _QueueHandler(records)
+    qh.setLevel(min(file_level, stream_level))
+    logger.addHandler(qh)
+    listener.start()
+
+    # write all pending records on exit
+    def stop():
+        listener.stop()
+        bh.close()
+        fh.close()
+
+    atexit.register(stop)
+
+
+def log_statistics(source, interval=10.0, level=logging.INFO, name='vs2lab.statistics'):
+    # periodically log a statistics snapshot (e.g. Channel.statistics) from a daemon thread
+    # returns an event that stops logging when set
+    logger = logging.getLogger(name)
+    stopped = threading.Event()
+
+    def run():
+        while not stopped.wait(interval):
+            logger.log(level, '%s', source())
+
+    threading.Thread(target=run, name='log-statistics', daemon=True).start()
+    return stopped
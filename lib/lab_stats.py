@@ -0,0 +1,13 @@
+import math
+
+
+def percentile(values, p):
+    """
+    Nearest rank percentile.
+    :param values: sorted values
+    :param p: percentile (0-100)
+    :return: smallest value with at least p percent of the values less or equal, None if there are no values
+    """
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
@@ -0,0 +1,103 @@
+"""
+Unit test of the local channel (hub shared by threads of one process)
+"""
+
+import unittest
+
+from lib.lab_local_channel import LocalChannel, LocalHub
+
+
+class TestLocalChannel(unittest.TestCase):
+    """The test"""
+
+    def setUp(self):
+        super().setUp()
+        # wide member ids, so a rejoining member does not get the id of its former slot by chance
+        self.hub = LocalHub(4, n_bits=30, processes=False)
+
+    def member(self, subgroup="peer"):
+        """Join a new member with its own channel (bindings are per os process)"""
+        channel = LocalChannel(self.hub)
+        pid = channel.join(subgroup)
+        channel.bind(pid)
+        return channel, pid
+
+    def test_receive_from_keeps_other_senders_pending(self):
+        """Test selective receive keeping messages of other senders queued in arrival order"""
+        receiver, pid_a = self.member()
+        chan_b, pid_b = self.member()
+        chan_c, pid_c = self.member()
+        chan_b.send_to({pid_a}, "b1")
+        chan_b.send_to({pid_a}, "b2")
+        chan_c.send_to({pid_a}, "c1")
+        self.assertEqual(receiver.receive_from({pid_c}, None), (pid_c, "c1"))
+        self.assertIsNone(receiver.receive_from({pid_c}, None))
+        self.assertEqual(receiver.receive_from_any(None), (pid_b, "b1"))
+        self.assertEqual(receiver.receive_from({pid_b}, None), (pid_b, "b2"))
+        self.assertIsNone(receiver.receive_from_any(None))
+
+    def test_recycled_slot_drops_stale_messages(self):
+        """Test a new member of a slot not receiving messages sent to its former member"""
+        former, pid_a = self.member()
+        sender, pid_b = self.member()
+        sender.send_to({pid_a}, "stale")
+        former.leave("peer")
+        receiver, pid_c = self.member()
+        self.assertEqual(self.hub.ids[0], int(pid_c))  # slot of the former member
+        self.assertNotEqual(pid_c, pid_a)
+        self.assertIsNone(receiver.receive_from_any(None))
+        sender.send_to({pid_c}, "fresh")
+        self.assertEqual(receiver.receive_from_any(None), (pid_b, "fresh"))
+
+    def test_send_to_unknown_receiver(self):
+        """Test sending to a member that left, nothing is delivered to the other receivers"""
+        sender, _ = self.member()
+        receiver, pid_b = self.member()
+        gone, pid_c = self.member()
+        gone.leave("peer")
+        with self.assertRaisesRegex(AssertionError, "unknown receiver"):
+            sender.send_to({pid_b, pid_c}, "message")
+        self.assertIsNone(receiver.receive_from_any(None))
+
+    def test_leave_and_join(self):
+        """Test a member leaving and joining again on the same slot"""
+        channel, pid_a = self.member()
+        sender, pid_b = self.member()
+        channel.leave("peer")
+        self.assertFalse(sender.exists(pid_a))
+        pid_c = channel.join("other")
+        channel.bind(pid_c)
+        self.assertEqual(self.hub.ids[0], int(pid_c))
+        self.assertTrue(sender.exists(pid_c))
+        self.assertEqual(sender.subgroup("other"), {pid_c})
+        self.assertTrue(sender.in_subgroup(pid_c, "other"))
+        self.assertFalse(sender.in_subgroup(pid_c, "peer"))
+        sender.send_to({pid_c}, "again")
+        self.assertEqual(channel.receive_from_any(None), (pid_b, "again"))
+
+    def test_receive_batch_order(self):
+        """Test batches ordered by sender, each sender keeping its sending order"""
+        receiver, pid_a = self.member()
+        chan_b, pid_b = self.member()
+        chan_c, pid_c = self.member()
+        chan_c.send_to({pid_a}, "c1")
+        chan_b.send_to({pid_a}, "b1")
+        chan_c.send_to({pid_a}, "c2")
+        chan_b.send_to({pid_a}, "b2")
+        sent = {pid_b: ["b1", "b2"], pid_c: ["c1", "c2"]}
+        expected = [(pid, message) for pid in sorted(sent, key=int) for message in sent[pid]]
+        self.assertEqual(receiver.receive_batch(10, None), expected)
+
+    def test_receive_batch_max_n(self):
+        """Test batches stopping at max_n, the rest stays queued"""
+        receiver, pid_a = self.member()
+        sender, pid_b = self.member()
+        for i in range(5):
+            sender.send_to({pid_a}, i)
+        self.assertEqual(receiver.receive_batch(3, None), [(pid_b, 0), (pid_b, 1), (pid_b, 2)])
+        self.assertEqual(receiver.receive_batch(3, None), [(pid_b, 3), (pid_b, 4)])
+        self.assertEqual(receiver.receive_batch(3, None), [])
+
+
+if __name__ == '__main__':
+    unittest.main()